@@ -15,7 +15,8 @@ DEFAULT_CONFIG = {
         "client_id": "chiller_controller_default",
         "base_topic": "chiller",
         "home_assistant_discovery_prefix": "homeassistant",
-        "external_ahu_call_topic": "chiller/external_ahu/call"
+        "external_ahu_call_topic": "chiller/external_ahu/call",
+        "temp_publish_deadband_f": 0.1 # Temperature changes smaller than this aren't re-published (0 = publish every sample)
     },
     "gpio_settings": {
         "pump_pin": 17,
@@ -36,7 +37,8 @@ DEFAULT_CONFIG = {
         "controller_loop_interval_sec": 2,
         "sensor_poll_interval_sec": 5,
         "mqtt_status_publish_interval_sec": 60,
-        "mqtt_failsafe_timeout_sec": 75
+        "mqtt_failsafe_timeout_sec": 75,
+        "persist_flush_interval_sec": 5 # Min time between writes of changed settings/overrides to disk
     },
     "temperature_sensors": {
         "ids": {}, 
@@ -44,7 +46,9 @@ DEFAULT_CONFIG = {
         "critical_sensors": ["supply"]
     },
     "general_settings": {
-        "debug_logging_enabled": True
+        "debug_logging_enabled": True,
+        "controller_cpu_affinity": [],     # e.g. [3] to pin the control thread to one core; empty = no pinning
+        "controller_realtime_priority": 0  # 1-99 runs the control thread SCHED_FIFO (needs CAP_SYS_NICE); 0 = off
     }
 }
 
@@ -64,74 +68,131 @@ else:
     print(f"[CONFIG_WARNING] {CONFIG_FILE_PATH} not found. Using default values.")
     _config_data = DEFAULT_CONFIG
 
-def _get_config_value(path, default):
-    """Helper to get nested config values."""
-    keys = path.split('.')
-    val = _config_data
-    try:
-        for key in keys:
-            val = val[key]
-        # Handle cases where the loaded value might be None from JSON
-        # but we expect a specific type based on the default.
-        if val is None and default is not None:
-             return default
-        return val
-    except (KeyError, TypeError):
+def _flatten(d, prefix="", out=None):
+    """
+    Flatten a nested config dict into {"section.key": value, ...}.
+    Nested dicts are kept under their own path too (e.g. "temperature_sensors.ids").
+    """
+    if out is None:
+        out = {}
+    for key, val in d.items():
+        path = f"{prefix}{key}"
+        out[path] = val
+        if isinstance(val, dict):
+            _flatten(val, f"{path}.", out)
+    return out
+
+# Resolve both trees once so every lookup below is a single dict access.
+_FLAT_DEFAULTS = _flatten(DEFAULT_CONFIG)
+_FLAT_CONFIG = _flatten(_config_data) if isinstance(_config_data, dict) else {}
+
+def _get_config_value(path):
+    """Helper to get a config value by dotted path, falling back to DEFAULT_CONFIG."""
+    default = _FLAT_DEFAULTS[path]
+    val = _FLAT_CONFIG.get(path, default)
+    # Handle cases where the loaded value might be None from JSON
+    # but we expect a specific type based on the default.
+    if val is None and default is not None:
         return default
+    return val
+
+# JSON already yields the right types in the normal case; only convert when it doesn't.
+def _as_int(val):
+    return val if type(val) is int else int(val)
+
+def _as_float(val):
+    return val if type(val) is float else float(val)
+
+def _as_bool(val):
+    return val if type(val) is bool else bool(val)
+
+def _as_str(val):
+    return val if type(val) is str else str(val)
 
 # --- MQTT Settings ---
-MQTT_BROKER_ADDRESS = str(_get_config_value("mqtt_settings.broker_address", DEFAULT_CONFIG["mqtt_settings"]["broker_address"]))
-MQTT_BROKER_PORT = int(_get_config_value("mqtt_settings.broker_port", DEFAULT_CONFIG["mqtt_settings"]["broker_port"]))
-MQTT_USERNAME = str(_get_config_value("mqtt_settings.username", DEFAULT_CONFIG["mqtt_settings"]["username"]))
-MQTT_PASSWORD = str(_get_config_value("mqtt_settings.password", DEFAULT_CONFIG["mqtt_settings"]["password"]))
-MQTT_CLIENT_ID = str(_get_config_value("mqtt_settings.client_id", DEFAULT_CONFIG["mqtt_settings"]["client_id"]))
-MQTT_BASE_TOPIC = str(_get_config_value("mqtt_settings.base_topic", DEFAULT_CONFIG["mqtt_settings"]["base_topic"])).rstrip('/')
-HA_DISCOVERY_PREFIX = str(_get_config_value("mqtt_settings.home_assistant_discovery_prefix", DEFAULT_CONFIG["mqtt_settings"]["home_assistant_discovery_prefix"])).rstrip('/')
+MQTT_BROKER_ADDRESS = _as_str(_get_config_value("mqtt_settings.broker_address"))
+MQTT_BROKER_PORT = _as_int(_get_config_value("mqtt_settings.broker_port"))
+MQTT_USERNAME = _as_str(_get_config_value("mqtt_settings.username"))
+MQTT_PASSWORD = _as_str(_get_config_value("mqtt_settings.password"))
+MQTT_CLIENT_ID = _as_str(_get_config_value("mqtt_settings.client_id"))
+MQTT_BASE_TOPIC = _as_str(_get_config_value("mqtt_settings.base_topic")).rstrip('/')
+HA_DISCOVERY_PREFIX = _as_str(_get_config_value("mqtt_settings.home_assistant_discovery_prefix")).rstrip('/')
+
+TEMP_PUBLISH_DEADBAND_F = _as_float(_get_config_value("mqtt_settings.temp_publish_deadband_f"))
 
 TOPIC_AVAILABILITY = f"{MQTT_BASE_TOPIC}/status/availability"
-TOPIC_EXTERNAL_AHU_CALL = str(_get_config_value("mqtt_settings.external_ahu_call_topic", DEFAULT_CONFIG["mqtt_settings"]["external_ahu_call_topic"]))
+TOPIC_EXTERNAL_AHU_CALL = _as_str(_get_config_value("mqtt_settings.external_ahu_call_topic"))
 
 CONTROL_TOPIC_BASE = f"{MQTT_BASE_TOPIC}/control"
 STATUS_TOPIC_BASE = f"{MQTT_BASE_TOPIC}/status"
 TEMP_TOPIC_BASE = f"{MQTT_BASE_TOPIC}/sensor"
 
+# Fixed state topics, built once. The matching command topic is the state topic + "/set".
+TOPIC_SETPOINT = f"{CONTROL_TOPIC_BASE}/setpoint"
+TOPIC_DIFFERENTIAL = f"{CONTROL_TOPIC_BASE}/differential"
+TOPIC_AMBIENT_LOCKOUT_SETPOINT = f"{CONTROL_TOPIC_BASE}/ambient_lockout_setpoint"
+TOPIC_OVERRIDES = {device: f"{CONTROL_TOPIC_BASE}/{device}_override" for device in ("pump", "chiller", "cooling")}
+TOPIC_RESEND_DISCOVERY = f"{CONTROL_TOPIC_BASE}/resend_discovery"
+
+TOPIC_STATUS_COOLING_CALL_ACTIVE = f"{STATUS_TOPIC_BASE}/cooling_call_active"
+TOPIC_STATUS_PUMP_RELAY = f"{STATUS_TOPIC_BASE}/pump_relay_state"
+TOPIC_STATUS_CONDENSER_RELAY = f"{STATUS_TOPIC_BASE}/condenser_relay_state"
+TOPIC_STATUS_CRITICAL_SENSOR_FAULT = f"{STATUS_TOPIC_BASE}/critical_sensor_fault"
+TOPIC_STATUS_AMBIENT_LOCKOUT_ACTIVE = f"{STATUS_TOPIC_BASE}/ambient_lockout_active"
+
+# QoS levels: sampled values that are re-sent anyway go fire-and-forget; settings, availability and
+# discovery (which HA must not miss) are acknowledged.
+QOS_FAST = 0
+QOS_RELIABLE = 1
+
 # --- GPIO Settings ---
-PUMP_PIN = int(_get_config_value("gpio_settings.pump_pin", DEFAULT_CONFIG["gpio_settings"]["pump_pin"]))
-CONDENSER_PIN = int(_get_config_value("gpio_settings.condenser_pin", DEFAULT_CONFIG["gpio_settings"]["condenser_pin"]))
-RELAY_ACTIVE_HIGH = bool(_get_config_value("gpio_settings.relay_active_high", DEFAULT_CONFIG["gpio_settings"]["relay_active_high"]))
+PUMP_PIN = _as_int(_get_config_value("gpio_settings.pump_pin"))
+CONDENSER_PIN = _as_int(_get_config_value("gpio_settings.condenser_pin"))
+RELAY_ACTIVE_HIGH = _as_bool(_get_config_value("gpio_settings.relay_active_high"))
 
 # --- Operational Parameters ---
-FALLBACK_SETPOINT_F = float(_get_config_value("operational_parameters.fallback_setpoint_f", DEFAULT_CONFIG["operational_parameters"]["fallback_setpoint_f"]))
-INITIAL_DIFFERENTIAL_F = float(_get_config_value("operational_parameters.initial_differential_f", DEFAULT_CONFIG["operational_parameters"]["initial_differential_f"]))
-CONDENSER_MIN_OFF_TIME_SEC = int(_get_config_value("operational_parameters.condenser_min_off_time_sec", DEFAULT_CONFIG["operational_parameters"]["condenser_min_off_time_sec"]))
-AHU_CALL_TIMEOUT_SEC = int(_get_config_value("operational_parameters.ahu_call_timeout_sec", DEFAULT_CONFIG["operational_parameters"]["ahu_call_timeout_sec"]))
-PUMP_POST_PURGE_DURATION_SEC = int(_get_config_value("operational_parameters.pump_post_purge_duration_sec", DEFAULT_CONFIG["operational_parameters"]["pump_post_purge_duration_sec"]))
+FALLBACK_SETPOINT_F = _as_float(_get_config_value("operational_parameters.fallback_setpoint_f"))
+INITIAL_DIFFERENTIAL_F = _as_float(_get_config_value("operational_parameters.initial_differential_f"))
+CONDENSER_MIN_OFF_TIME_SEC = _as_int(_get_config_value("operational_parameters.condenser_min_off_time_sec"))
+AHU_CALL_TIMEOUT_SEC = _as_int(_get_config_value("operational_parameters.ahu_call_timeout_sec"))
+PUMP_POST_PURGE_DURATION_SEC = _as_int(_get_config_value("operational_parameters.pump_post_purge_duration_sec"))
 
 # New Ambient Lockout Parameters
-INITIAL_AMBIENT_LOCKOUT_SETPOINT_F = float(_get_config_value("operational_parameters.initial_ambient_lockout_setpoint_f", DEFAULT_CONFIG["operational_parameters"]["initial_ambient_lockout_setpoint_f"]))
-AMBIENT_LOCKOUT_DEADBAND_F = float(_get_config_value("operational_parameters.ambient_lockout_deadband_f", DEFAULT_CONFIG["operational_parameters"]["ambient_lockout_deadband_f"]))
-AMBIENT_LOCKOUT_DEBOUNCE_DURATION_SEC = int(_get_config_value("operational_parameters.ambient_lockout_debounce_duration_sec", DEFAULT_CONFIG["operational_parameters"]["ambient_lockout_debounce_duration_sec"]))
+INITIAL_AMBIENT_LOCKOUT_SETPOINT_F = _as_float(_get_config_value("operational_parameters.initial_ambient_lockout_setpoint_f"))
+AMBIENT_LOCKOUT_DEADBAND_F = _as_float(_get_config_value("operational_parameters.ambient_lockout_deadband_f"))
+AMBIENT_LOCKOUT_DEBOUNCE_DURATION_SEC = _as_int(_get_config_value("operational_parameters.ambient_lockout_debounce_duration_sec"))
 
 
 # --- Timing Intervals ---
-CONTROLLER_LOOP_INTERVAL_SEC = float(_get_config_value("timing_intervals.controller_loop_interval_sec", DEFAULT_CONFIG["timing_intervals"]["controller_loop_interval_sec"]))
-SENSOR_POLL_INTERVAL_SEC = float(_get_config_value("timing_intervals.sensor_poll_interval_sec", DEFAULT_CONFIG["timing_intervals"]["sensor_poll_interval_sec"]))
-MQTT_STATUS_PUBLISH_INTERVAL_SEC = float(_get_config_value("timing_intervals.mqtt_status_publish_interval_sec", DEFAULT_CONFIG["timing_intervals"]["mqtt_status_publish_interval_sec"]))
-MQTT_FAILSAFE_TIMEOUT_SEC = float(_get_config_value("timing_intervals.mqtt_failsafe_timeout_sec", DEFAULT_CONFIG["timing_intervals"]["mqtt_failsafe_timeout_sec"]))
+CONTROLLER_LOOP_INTERVAL_SEC = _as_float(_get_config_value("timing_intervals.controller_loop_interval_sec"))
+SENSOR_POLL_INTERVAL_SEC = _as_float(_get_config_value("timing_intervals.sensor_poll_interval_sec"))
+MQTT_STATUS_PUBLISH_INTERVAL_SEC = _as_float(_get_config_value("timing_intervals.mqtt_status_publish_interval_sec"))
+MQTT_FAILSAFE_TIMEOUT_SEC = _as_float(_get_config_value("timing_intervals.mqtt_failsafe_timeout_sec"))
+PERSIST_FLUSH_INTERVAL_SEC = _as_float(_get_config_value("timing_intervals.persist_flush_interval_sec"))
+
+# Sub-second loop periods (e.g. 0.25) are fine since the loop waits on an Event, but a zero or
+# negative period would turn it into a busy spin.
+if CONTROLLER_LOOP_INTERVAL_SEC <= 0:
+    print(f"[CONFIG_WARNING] controller_loop_interval_sec must be > 0 (got {CONTROLLER_LOOP_INTERVAL_SEC}). Using default.")
+    CONTROLLER_LOOP_INTERVAL_SEC = _as_float(_FLAT_DEFAULTS["timing_intervals.controller_loop_interval_sec"])
 
 # --- Temperature Sensor Configuration ---
-SENSOR_IDS = _get_config_value("temperature_sensors.ids", DEFAULT_CONFIG["temperature_sensors"]["ids"])
-SENSOR_FRIENDLY_NAMES = _get_config_value("temperature_sensors.friendly_names", DEFAULT_CONFIG["temperature_sensors"]["friendly_names"])
-CRITICAL_SENSOR_KEYS = list(_get_config_value("temperature_sensors.critical_sensors", DEFAULT_CONFIG["temperature_sensors"]["critical_sensors"]))
+SENSOR_IDS = _get_config_value("temperature_sensors.ids")
+SENSOR_FRIENDLY_NAMES = _get_config_value("temperature_sensors.friendly_names")
+CRITICAL_SENSOR_KEYS = frozenset(_get_config_value("temperature_sensors.critical_sensors")) # Only ever used for membership tests
 
 # --- General Settings ---
-DEBUG_LOGGING_ENABLED = bool(_get_config_value("general_settings.debug_logging_enabled", DEFAULT_CONFIG["general_settings"]["debug_logging_enabled"]))
+DEBUG_LOGGING_ENABLED = _as_bool(_get_config_value("general_settings.debug_logging_enabled"))
+CONTROLLER_CPU_AFFINITY = [_as_int(cpu) for cpu in _get_config_value("general_settings.controller_cpu_affinity")]
+CONTROLLER_REALTIME_PRIORITY = _as_int(_get_config_value("general_settings.controller_realtime_priority"))
 
 # --- Persistent State File Paths ---
 PERSISTENCE_DIR = os.path.dirname(os.path.abspath(__file__)) 
 SETPOINT_FILE = os.path.join(PERSISTENCE_DIR, "setpoint.json")
 OPERATIONAL_PARAMS_FILE = os.path.join(PERSISTENCE_DIR, "operational_params.json") 
 OVERRIDES_FILE = os.path.join(PERSISTENCE_DIR, "overrides.json")
+# Single file holding all of the above; the three files before it are only read to migrate older installs.
+PERSISTENT_STATE_FILE = os.path.join(PERSISTENCE_DIR, "persistent_state.json")
 
 # --- Sanity Checks & Logging (Optional but Recommended) ---
 if DEBUG_LOGGING_ENABLED:
@@ -141,8 +202,10 @@ if DEBUG_LOGGING_ENABLED:
     print(f"[CONFIG_LOADED] Initial Ambient Lockout Setpoint: {INITIAL_AMBIENT_LOCKOUT_SETPOINT_F}°F, Debounce: {AMBIENT_LOCKOUT_DEBOUNCE_DURATION_SEC}s, Deadband: {AMBIENT_LOCKOUT_DEADBAND_F}°F") # <-- NEW LOG LINE
     print("[CONFIG_LOADED] Sensor IDs:", SENSOR_IDS)
     if not SENSOR_IDS:
+        # Covers the per-sensor warnings below; no need to test each key against an empty dict.
         print("[CONFIG_WARNING] No sensor IDs found in configuration. Temperature sensing will not function.")
-    if "supply" not in SENSOR_IDS:
-        print("[CONFIG_WARNING] 'supply' sensor ID not found in configuration. This is critical for operation.")
-    if "ambient" not in SENSOR_IDS: # <-- NEW WARNING
-        print("[CONFIG_WARNING] 'ambient' sensor ID not found in configuration. Ambient lockout feature will not function correctly.")
\ No newline at end of file
+    else:
+        if "supply" not in SENSOR_IDS:
+            print("[CONFIG_WARNING] 'supply' sensor ID not found in configuration. This is critical for operation.")
+        if "ambient" not in SENSOR_IDS: # <-- NEW WARNING
+            print("[CONFIG_WARNING] 'ambient' sensor ID not found in configuration. Ambient lockout feature will not function correctly.")
\ No newline at end of file
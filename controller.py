@@ -1,5 +1,6 @@
 # controller.py
 
+import os
 import time
 try:
     import RPi.GPIO as GPIO
@@ -14,23 +15,35 @@ from config import (
     CONDENSER_PIN,
     RELAY_ACTIVE_HIGH,
     CONDENSER_MIN_OFF_TIME_SEC,
-    CONTROLLER_LOOP_INTERVAL_SEC
+    CONTROLLER_LOOP_INTERVAL_SEC,
+    CONTROLLER_CPU_AFFINITY,
+    CONTROLLER_REALTIME_PRIORITY
 )
 # SystemState is passed as an argument
 
+# Manual pump override -> (pump relay decision, debug message). A missing key means auto mode.
+_PUMP_OVERRIDE_DECISIONS = {
+    "on": (True, "[CTL_PUMP] Manual override ON."),
+    "off": (False, "[CTL_PUMP] Manual override OFF."),
+}
+
 _gpio_initialized = False
+_gpio_output = None # GPIO.output, bound once in _setup_gpio()
+_ON_SIGNAL = None   # GPIO level that energizes a relay, resolved once in _setup_gpio()
+_OFF_SIGNAL = None
 
 def _setup_gpio():
-    global _gpio_initialized
-    if not GPIO_AVAILABLE or _gpio_initialized:
-        return GPIO_AVAILABLE
+    global _gpio_initialized, _gpio_output, _ON_SIGNAL, _OFF_SIGNAL
+    if _gpio_initialized:
+        return True
 
     try:
         GPIO.setmode(GPIO.BCM)
         GPIO.setwarnings(False) 
-        initial_relay_state = GPIO.LOW if RELAY_ACTIVE_HIGH else GPIO.HIGH
-        GPIO.setup(PUMP_PIN, GPIO.OUT, initial=initial_relay_state)
-        GPIO.setup(CONDENSER_PIN, GPIO.OUT, initial=initial_relay_state)
+        _ON_SIGNAL, _OFF_SIGNAL = (GPIO.HIGH, GPIO.LOW) if RELAY_ACTIVE_HIGH else (GPIO.LOW, GPIO.HIGH)
+        GPIO.setup(PUMP_PIN, GPIO.OUT, initial=_OFF_SIGNAL)
+        GPIO.setup(CONDENSER_PIN, GPIO.OUT, initial=_OFF_SIGNAL)
+        _gpio_output = GPIO.output
         _gpio_initialized = True
         if DEBUG_LOGGING_ENABLED:
             print(f"[CONTROLLER_GPIO] GPIO initialized. Pump Pin: {PUMP_PIN}, Condenser Pin: {CONDENSER_PIN}. Initial state: {'LOW (OFF)' if RELAY_ACTIVE_HIGH else 'HIGH (OFF)'}")
@@ -41,45 +54,198 @@ def _setup_gpio():
         return False
 
 def _set_gpio_state(pin, desired_state_on):
-    if not GPIO_AVAILABLE or not _gpio_initialized:
+    if not _gpio_initialized:
         return
 
     try:
-        actual_gpio_signal = (GPIO.HIGH if RELAY_ACTIVE_HIGH else GPIO.LOW) if desired_state_on else (GPIO.LOW if RELAY_ACTIVE_HIGH else GPIO.HIGH)
-        GPIO.output(pin, actual_gpio_signal)
+        _gpio_output(pin, _ON_SIGNAL if desired_state_on else _OFF_SIGNAL)
     except Exception as e:
         print(f"[CONTROLLER_GPIO_ERROR] Failed to set GPIO pin {pin}: {e}")
 
+def _set_gpio_states(pins, desired_states_on):
+    """Drives several relay pins with a single GPIO.output call (RPi.GPIO accepts parallel lists)."""
+    if not _gpio_initialized:
+        return
+
+    try:
+        _gpio_output(pins, [_ON_SIGNAL if state_on else _OFF_SIGNAL for state_on in desired_states_on])
+    except Exception as e:
+        print(f"[CONTROLLER_GPIO_ERROR] Failed to set GPIO pins {pins}: {e}")
+
 
 def cleanup_gpio():
     global _gpio_initialized
-    if GPIO_AVAILABLE and _gpio_initialized:
+    if _gpio_initialized:
         if DEBUG_LOGGING_ENABLED:
             print("[CONTROLLER_GPIO] Cleaning up GPIO...")
-        _set_gpio_state(PUMP_PIN, False)
-        _set_gpio_state(CONDENSER_PIN, False)
+        _set_gpio_states([PUMP_PIN, CONDENSER_PIN], [False, False])
         GPIO.cleanup()
         _gpio_initialized = False
         if DEBUG_LOGGING_ENABLED:
             print("[CONTROLLER_GPIO] GPIO cleanup complete.")
-    elif not GPIO_AVAILABLE and DEBUG_LOGGING_ENABLED: # Only log if debug enabled
-        # print("[CONTROLLER_GPIO] GPIO not available, no cleanup needed.") # Less verbose
+
+if not GPIO_AVAILABLE:
+    # No RPi.GPIO (e.g. a development machine): GPIO operations are simulated, so swap in
+    # no-op versions once at import instead of re-checking GPIO_AVAILABLE on every call.
+    def _setup_gpio():
+        return False
+
+    def _set_gpio_state(pin, desired_state_on):
         pass
 
+    def _set_gpio_states(pins, desired_states_on):
+        pass
+
+    def cleanup_gpio():
+        pass
+
+
+def _decide_relays(manual_pump_override, manual_condenser_override, is_ambient_lockout_active,
+                   demand_for_pump_via_call, critical_sensor_fault, supply_temp_f,
+                   turn_on_threshold, turn_off_threshold, condenser_running, now_mono, condenser_last_off_time,
+                   debug_msgs):
+    """
+    Decides the pump and condenser relay states for one controller iteration.
+    Works only on plain values so it can be reasoned about (and tested) without a SystemState.
+    Returns (pump_on, condenser_on, cancel_post_purge); debug lines are appended to debug_msgs
+    (which is None when debug logging is disabled).
+    """
+    # --- Pump Control Logic ---
+    pump_on_decision = False
+    cancel_post_purge = False
+
+    pump_override_decision = _PUMP_OVERRIDE_DECISIONS.get(manual_pump_override)
+    if pump_override_decision is not None:
+        pump_on_decision, override_msg = pump_override_decision
+        cancel_post_purge = True
+        if DEBUG_LOGGING_ENABLED:
+            debug_msgs.append(override_msg)
+    else: # Auto mode for pump
+        if is_ambient_lockout_active: # <-- AMBIENT LOCKOUT CHECK FOR PUMP
+            pump_on_decision = False # If ambient lockout, no pump for auto cooling calls
+            if DEBUG_LOGGING_ENABLED:
+                if demand_for_pump_via_call: # Log if there was demand but lockout prevented it
+                    debug_msgs.append("[CTL_PUMP] Auto: Demand active, but AMBIENT LOCKOUT prevents pump. Pump OFF.")
+                else:
+                    debug_msgs.append("[CTL_PUMP] Auto: No demand. Pump OFF (Ambient lockout also active).")
+        elif demand_for_pump_via_call:
+            pump_on_decision = True
+            if DEBUG_LOGGING_ENABLED:
+                debug_msgs.append(f"[CTL_PUMP] Auto: Demand active (call or post-purge). Pump ON.")
+        else:
+            pump_on_decision = False
+            if DEBUG_LOGGING_ENABLED:
+                debug_msgs.append("[CTL_PUMP] Auto: No demand. Pump OFF.")
+
+    # --- Condenser Control Logic ---
+    condenser_on_decision = False
+
+    if manual_condenser_override == "on":
+        if pump_on_decision: # Condenser manual ON only if pump is (or will be) ON
+            condenser_on_decision = True
+            if DEBUG_LOGGING_ENABLED:
+                debug_msgs.append("[CTL_COND] Manual override ON (Pump is ON). Ambient lockout BYPASSED by manual override.")
+        else:
+            condenser_on_decision = False
+            if DEBUG_LOGGING_ENABLED:
+                debug_msgs.append("[CTL_COND] Manual override ON attempt, but Pump is OFF. Condenser OFF.")
+    elif manual_condenser_override == "off":
+        condenser_on_decision = False
+        if DEBUG_LOGGING_ENABLED:
+            debug_msgs.append("[CTL_COND] Manual override OFF.")
+    # Auto mode for condenser (only if not manually overridden)
+    elif not pump_on_decision:
+        condenser_on_decision = False
+        if DEBUG_LOGGING_ENABLED:
+            debug_msgs.append("[CTL_COND] Auto: Pump OFF, so Condenser OFF.")
+    elif is_ambient_lockout_active: # <-- AMBIENT LOCKOUT CHECK FOR CONDENSER (AUTO)
+        condenser_on_decision = False
+        if DEBUG_LOGGING_ENABLED:
+            debug_msgs.append("[CTL_COND] Auto: AMBIENT LOCKOUT active. Condenser OFF.")
+    elif critical_sensor_fault:
+        condenser_on_decision = False
+        if DEBUG_LOGGING_ENABLED:
+            debug_msgs.append(f"[CTL_COND] Auto: Critical sensor fault. Condenser OFF.")
+    elif supply_temp_f is None: 
+        condenser_on_decision = False
+        if DEBUG_LOGGING_ENABLED:
+            debug_msgs.append("[CTL_COND] Auto: Supply temperature is None. Condenser OFF.")
+    else: # Auto mode, pump on, no lockout, sensors okay
+        if DEBUG_LOGGING_ENABLED:
+            debug_msgs.append(f"[CTL_COND] Auto: Supply={supply_temp_f:.1f}°F, Setpoint={turn_off_threshold:.1f}°F, Diff={turn_on_threshold - turn_off_threshold:.1f}°F")
+            debug_msgs.append(f"[CTL_COND] Auto: OnThresh={turn_on_threshold:.1f}°F, OffThresh={turn_off_threshold:.1f}°F")
+
+        if condenser_running: # Condenser was (or should be) ON
+            if supply_temp_f <= turn_off_threshold:
+                condenser_on_decision = False
+                if DEBUG_LOGGING_ENABLED:
+                    debug_msgs.append(f"[CTL_COND] Auto: Running, temp ({supply_temp_f:.1f}) <= off_thresh. Turning OFF.")
+            else:
+                condenser_on_decision = True 
+                if DEBUG_LOGGING_ENABLED:
+                    debug_msgs.append(f"[CTL_COND] Auto: Running, temp ({supply_temp_f:.1f}) > off_thresh. Staying ON.")
+        else: # Condenser was (or should be) OFF
+            if supply_temp_f >= turn_on_threshold:
+                time_since_last_off = now_mono - condenser_last_off_time
+                if time_since_last_off >= CONDENSER_MIN_OFF_TIME_SEC:
+                    condenser_on_decision = True
+                    if DEBUG_LOGGING_ENABLED:
+                        debug_msgs.append(f"[CTL_COND] Auto: OFF, temp ({supply_temp_f:.1f}) >= on_thresh AND min_off_time met. Turning ON.")
+                else:
+                    condenser_on_decision = False 
+                    if DEBUG_LOGGING_ENABLED:
+                        debug_msgs.append(f"[CTL_COND] Auto: OFF, temp high, but min_off_time not met (waiting {CONDENSER_MIN_OFF_TIME_SEC - time_since_last_off:.0f}s). Staying OFF.")
+            else:
+                condenser_on_decision = False 
+                if DEBUG_LOGGING_ENABLED:
+                    debug_msgs.append(f"[CTL_COND] Auto: OFF, temp ({supply_temp_f:.1f}) < on_thresh. Staying OFF.")
+
+    return pump_on_decision, condenser_on_decision, cancel_post_purge
+
+
+def _apply_realtime_scheduling():
+    """
+    Optionally pins the calling (control) thread to CPUs and/or switches it to SCHED_FIFO.
+    Both are off by default; on Linux a pid of 0 targets only the calling thread.
+    SCHED_FIFO needs root or CAP_SYS_NICE. Failures are logged and the loop runs with normal scheduling.
+    """
+    if CONTROLLER_CPU_AFFINITY and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, set(CONTROLLER_CPU_AFFINITY))
+            if DEBUG_LOGGING_ENABLED:
+                print(f"[CONTROLLER_SCHED] Control thread pinned to CPU(s) {sorted(CONTROLLER_CPU_AFFINITY)}.")
+        except OSError as e:
+            print(f"[CONTROLLER_SCHED_WARN] Could not set CPU affinity {CONTROLLER_CPU_AFFINITY}: {e}")
+
+    if CONTROLLER_REALTIME_PRIORITY > 0 and hasattr(os, "sched_setscheduler"):
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(CONTROLLER_REALTIME_PRIORITY))
+            if DEBUG_LOGGING_ENABLED:
+                print(f"[CONTROLLER_SCHED] Control thread running SCHED_FIFO, priority {CONTROLLER_REALTIME_PRIORITY}.")
+        except OSError as e:
+            print(f"[CONTROLLER_SCHED_WARN] Could not enable SCHED_FIFO (needs CAP_SYS_NICE): {e}")
+
 
 def control_loop(system_state, stop_event):
+    _apply_realtime_scheduling()
     if not _setup_gpio() and GPIO_AVAILABLE: 
         print("[CONTROLLER_ERROR] GPIO setup failed. Controller loop cannot safely operate relays.")
 
     if DEBUG_LOGGING_ENABLED:
         print("[CONTROLLER_LOOP] Control loop started.")
 
+    # One buffer for the life of the loop, emptied each iteration; stays None when debug is off.
+    current_debug_session_prints = [] if DEBUG_LOGGING_ENABLED else None
+
     while not stop_event.is_set():
-        now = time.time()
-        current_debug_session_prints = [] 
+        now = time.time() # Wall clock, only for debug timestamps
+        now_mono = time.monotonic() # Timer arithmetic (state timers are all monotonic); immune to NTP steps
+        if DEBUG_LOGGING_ENABLED:
+            current_debug_session_prints.clear()
 
         # --- 1. Update SystemState internal timers/flags ---
-        system_state.check_mqtt_failsafe() 
+        system_state.check_mqtt_failsafe(now_mono) 
+        system_state.maybe_flush_persistent(now_mono) # Write changed settings/overrides, at most once per flush interval
         # Ambient lockout status is updated in state.py when ambient temp is received or lockout setpoint changes.
         # We will retrieve the current ambient_lockout_active flag below.
 
@@ -88,124 +254,85 @@ def control_loop(system_state, stop_event):
         manual_condenser_override = system_state.get_override("chiller") 
         
         supply_temp_f = system_state.get_sensor_temp("supply")
+        critical_sensor_fault = system_state.is_critical_sensor_fault()
+        pump_relay_on = system_state.pump_relay
+        condenser_relay_on = system_state.condenser_relay
         # Ambient temp is not directly used here for decisions yet, but state.py uses it for lockout
         # We call update_ambient_lockout_status in state.py when sensors update.
         # Here, we just need to *read* the result:
         is_ambient_lockout_active = system_state.ambient_lockout_active # Read the pre-calculated flag
 
-        if is_ambient_lockout_active:
+        if DEBUG_LOGGING_ENABLED and is_ambient_lockout_active:
              current_debug_session_prints.append("[CTL_LOCKOUT] AMBIENT LOCKOUT ACTIVE.")
 
 
-        # --- 3. Pump Control Logic ---
-        demand_for_pump_via_call = system_state.check_for_call_timeout() # True if AHU call or post-purge
-        pump_on_decision = False
-
-        if manual_pump_override == "on":
-            pump_on_decision = True
-            system_state.pump_post_purge_end_time = 0 
-            current_debug_session_prints.append("[CTL_PUMP] Manual override ON.")
-        elif manual_pump_override == "off":
-            pump_on_decision = False
+        # --- 3/4. Pump & Condenser Decisions ---
+        turn_on_threshold, turn_off_threshold = system_state.get_thresholds()
+        pump_on_decision, condenser_on_decision, cancel_post_purge = _decide_relays(
+            manual_pump_override,
+            manual_condenser_override,
+            is_ambient_lockout_active,
+            system_state.check_for_call_timeout(now_mono), # True if AHU call or post-purge
+            critical_sensor_fault,
+            supply_temp_f,
+            turn_on_threshold,
+            turn_off_threshold,
+            condenser_relay_on,
+            now_mono,
+            system_state.condenser_last_off_time,
+            current_debug_session_prints
+        )
+        if cancel_post_purge:
             system_state.pump_post_purge_end_time = 0
-            current_debug_session_prints.append("[CTL_PUMP] Manual override OFF.")
-        else: # Auto mode for pump
-            if is_ambient_lockout_active: # <-- AMBIENT LOCKOUT CHECK FOR PUMP
-                pump_on_decision = False # If ambient lockout, no pump for auto cooling calls
-                if demand_for_pump_via_call: # Log if there was demand but lockout prevented it
-                    current_debug_session_prints.append("[CTL_PUMP] Auto: Demand active, but AMBIENT LOCKOUT prevents pump. Pump OFF.")
-                else:
-                    current_debug_session_prints.append("[CTL_PUMP] Auto: No demand. Pump OFF (Ambient lockout also active).")
-            elif demand_for_pump_via_call:
-                pump_on_decision = True
-                current_debug_session_prints.append(f"[CTL_PUMP] Auto: Demand active (call or post-purge). Pump ON.")
-            else:
-                pump_on_decision = False
-                current_debug_session_prints.append("[CTL_PUMP] Auto: No demand. Pump OFF.")
 
-        # --- 4. Condenser Control Logic ---
-        condenser_on_decision = False
-        is_condenser_currently_commanded_off = not system_state.get_relay_state("condenser")
-
-        if manual_condenser_override == "on":
-            if pump_on_decision: # Condenser manual ON only if pump is (or will be) ON
-                condenser_on_decision = True
-                current_debug_session_prints.append("[CTL_COND] Manual override ON (Pump is ON). Ambient lockout BYPASSED by manual override.")
-            else:
-                condenser_on_decision = False
-                current_debug_session_prints.append("[CTL_COND] Manual override ON attempt, but Pump is OFF. Condenser OFF.")
-        elif manual_condenser_override == "off":
-            condenser_on_decision = False
-            current_debug_session_prints.append("[CTL_COND] Manual override OFF.")
-        # Auto mode for condenser (only if not manually overridden)
-        elif not pump_on_decision:
-            condenser_on_decision = False
-            current_debug_session_prints.append("[CTL_COND] Auto: Pump OFF, so Condenser OFF.")
-        elif is_ambient_lockout_active: # <-- AMBIENT LOCKOUT CHECK FOR CONDENSER (AUTO)
-            condenser_on_decision = False
-            current_debug_session_prints.append("[CTL_COND] Auto: AMBIENT LOCKOUT active. Condenser OFF.")
-        elif system_state.is_critical_sensor_fault():
-            condenser_on_decision = False
-            current_debug_session_prints.append(f"[CTL_COND] Auto: Critical sensor fault. Condenser OFF.")
-        elif supply_temp_f is None: 
-            condenser_on_decision = False
-            current_debug_session_prints.append("[CTL_COND] Auto: Supply temperature is None. Condenser OFF.")
-        else: # Auto mode, pump on, no lockout, sensors okay
-            setpoint = system_state.setpoint
-            differential = system_state.differential
-            turn_on_threshold = setpoint + differential
-            turn_off_threshold = setpoint
-            
-            current_debug_session_prints.append(f"[CTL_COND] Auto: Supply={supply_temp_f:.1f}°F, Setpoint={setpoint:.1f}°F, Diff={differential:.1f}°F")
-            current_debug_session_prints.append(f"[CTL_COND] Auto: OnThresh={turn_on_threshold:.1f}°F, OffThresh={turn_off_threshold:.1f}°F")
-
-            if not is_condenser_currently_commanded_off: # Condenser was (or should be) ON
-                if supply_temp_f <= turn_off_threshold:
-                    condenser_on_decision = False
-                    current_debug_session_prints.append(f"[CTL_COND] Auto: Running, temp ({supply_temp_f:.1f}) <= off_thresh. Turning OFF.")
-                else:
-                    condenser_on_decision = True 
-                    current_debug_session_prints.append(f"[CTL_COND] Auto: Running, temp ({supply_temp_f:.1f}) > off_thresh. Staying ON.")
-            else: # Condenser was (or should be) OFF
-                if supply_temp_f >= turn_on_threshold:
-                    time_since_last_off = now - system_state.condenser_last_off_time
-                    if time_since_last_off >= CONDENSER_MIN_OFF_TIME_SEC:
-                        condenser_on_decision = True
-                        current_debug_session_prints.append(f"[CTL_COND] Auto: OFF, temp ({supply_temp_f:.1f}) >= on_thresh AND min_off_time met. Turning ON.")
-                    else:
-                        condenser_on_decision = False 
-                        current_debug_session_prints.append(f"[CTL_COND] Auto: OFF, temp high, but min_off_time not met (waiting {CONDENSER_MIN_OFF_TIME_SEC - time_since_last_off:.0f}s). Staying OFF.")
-                else:
-                    condenser_on_decision = False 
-                    current_debug_session_prints.append(f"[CTL_COND] Auto: OFF, temp ({supply_temp_f:.1f}) < on_thresh. Staying OFF.")
-        
         # --- 5. Actuate Relays & Update State Cache ---
-        if system_state.get_relay_state("pump") != pump_on_decision:
-            _set_gpio_state(PUMP_PIN, pump_on_decision)
-            system_state.set_relay_state("pump", pump_on_decision) 
-            current_debug_session_prints.append(f"[CTL_RELAY] Pump relay commanded {'ON' if pump_on_decision else 'OFF'}.")
-        
-        if system_state.get_relay_state("condenser") != condenser_on_decision:
-            _set_gpio_state(CONDENSER_PIN, condenser_on_decision)
-            system_state.set_relay_state("condenser", condenser_on_decision) 
-            current_debug_session_prints.append(f"[CTL_RELAY] Condenser relay commanded {'ON' if condenser_on_decision else 'OFF'}.")
+        changed_pins = []
+        changed_states = []
+        if pump_relay_on != pump_on_decision:
+            changed_pins.append(PUMP_PIN)
+            changed_states.append(pump_on_decision)
+        if condenser_relay_on != condenser_on_decision:
+            changed_pins.append(CONDENSER_PIN)
+            changed_states.append(condenser_on_decision)
+        if changed_pins:
+            # One GPIO write and one state update even when both relays flip in the same tick (e.g. start-up/shutdown).
+            _set_gpio_states(changed_pins, changed_states)
+            system_state.set_relay_states(pump_on_decision, condenser_on_decision)
+            if DEBUG_LOGGING_ENABLED:
+                if pump_relay_on != pump_on_decision:
+                    current_debug_session_prints.append(f"[CTL_RELAY] Pump relay commanded {'ON' if pump_on_decision else 'OFF'}.")
+                if condenser_relay_on != condenser_on_decision:
+                    current_debug_session_prints.append(f"[CTL_RELAY] Condenser relay commanded {'ON' if condenser_on_decision else 'OFF'}.")
+            pump_relay_on = pump_on_decision
+            condenser_relay_on = condenser_on_decision
+
+        if current_debug_session_prints: # Only print header if there's content (None when debug is off)
+            # Timestamps are only formatted here, once we know they will be printed.
+            condenser_last_off = system_state.condenser_last_off_time
+            post_purge_end = system_state.pump_post_purge_end_time
+            iteration_str = time.strftime('%H:%M:%S', time.localtime(now))
+            # State timestamps are monotonic; map them onto the wall clock for display.
+            last_off_str = time.strftime('%H:%M:%S', time.localtime(now - (now_mono - condenser_last_off)))
+            post_purge_str = time.strftime('%H:%M:%S', time.localtime(now + (post_purge_end - now_mono))) if post_purge_end > now_mono else 'N/A'
 
-        if DEBUG_LOGGING_ENABLED and current_debug_session_prints: # Only print header if there's content
-            print(f"--- Controller Loop Iteration ({time.strftime('%H:%M:%S', time.localtime(now))}) ---")
+            print(f"--- Controller Loop Iteration ({iteration_str}) ---")
             for msg in current_debug_session_prints:
                 print(msg)
-            print(f"Relay States (Commanded): Pump={system_state.get_relay_state('pump')}, Condenser={system_state.get_relay_state('condenser')}")
+            print(f"Relay States (Commanded): Pump={pump_relay_on}, Condenser={condenser_relay_on}")
             print(f"Ambient Lockout Active: {is_ambient_lockout_active}")
-            print(f"Condenser Last Off: {time.strftime('%H:%M:%S', time.localtime(system_state.condenser_last_off_time)) if system_state.condenser_last_off_time > 0 else 'N/A'}")
-            print(f"Pump Post-Purge Ends: {time.strftime('%H:%M:%S', time.localtime(system_state.pump_post_purge_end_time)) if system_state.pump_post_purge_end_time > now else 'N/A'}")
+            print(f"Condenser Last Off: {last_off_str}")
+            print(f"Pump Post-Purge Ends: {post_purge_str}")
             print(f"AHU Call Active (Flag): {system_state.is_ahu_calling}")
-            print(f"Supply Temp: {supply_temp_f if supply_temp_f is not None else 'N/A'}, Critical Fault: {system_state.is_critical_sensor_fault()}")
+            print(f"Supply Temp: {supply_temp_f if supply_temp_f is not None else 'N/A'}, Critical Fault: {critical_sensor_fault}")
             print("--- End Iteration ---")
 
-        for _ in range(int(CONTROLLER_LOOP_INTERVAL_SEC)):
-            if stop_event.is_set():
-                break
-            time.sleep(1)
+        # Block until the next periodic tick (min-off/post-purge timers, failsafe) or until SystemState
+        # signals a changed input (override, setpoint, AHU call, threshold crossing, lockout, fault).
+        # Clearing before the next read means a change that lands after this point is still picked up.
+        system_state.state_change_event.wait(CONTROLLER_LOOP_INTERVAL_SEC)
+        system_state.state_change_event.clear()
+        if stop_event.is_set():
+            break
 
     if DEBUG_LOGGING_ENABLED:
         print("[CONTROLLER_LOOP] Control loop stopped.")
@@ -1,6 +1,6 @@
 # main.py
 
-import time
+import signal
 import threading
 from config import DEBUG_LOGGING_ENABLED
 from state import SystemState
@@ -11,6 +11,12 @@ from controller import control_loop, cleanup_gpio # cleanup_gpio might be called
 # Create a global stop event for all threads
 stop_event = threading.Event()
 
+def _handle_sigterm(signum, frame):
+    # systemd/kill send SIGTERM; treat it like Ctrl+C by firing the shared stop event.
+    if DEBUG_LOGGING_ENABLED:
+        print("\n[MAIN_SHUTDOWN] SIGTERM received. Initiating shutdown sequence...")
+    stop_event.set()
+
 def main():
     if DEBUG_LOGGING_ENABLED:
         print("[MAIN] Initializing Chiller Controller Application...")
@@ -75,15 +81,13 @@ def main():
     # It's better to start this *before* the sensor and controller threads
     # so that HA discovery can happen early and states can be published.
     try:
-        mqtt_client.connect() # This is a blocking call until connected or timeout, or runs async if connect_async
-                              # Paho's connect() is blocking, then loop_start() makes it non-blocking.
+        mqtt_client.connect() # Non-blocking: connect_async() + loop_start(); Paho connects and reconnects in the background
         if DEBUG_LOGGING_ENABLED:
             print("[MAIN] MQTTClient connection process initiated.")
-            # Wait a moment for connection to establish before starting other threads
-            # This helps ensure MQTT is ready for initial publishes from other loops.
-            time.sleep(2) # Adjust as needed, or implement a more robust "wait for connected"
-            if not mqtt_client.connected:
-                 print("[MAIN_WARN] MQTT client did not connect within the initial wait. Check broker.")
+        # Wait for the CONNACK before starting other threads so MQTT is ready for their initial publishes.
+        # Returns as soon as _on_connect fires instead of always paying a fixed delay.
+        if not mqtt_client.connected_event.wait(timeout=5):
+            print("[MAIN_WARN] MQTT client did not connect within the initial wait. Check broker.")
 
     except Exception as e:
         print(f"[MAIN_CRITICAL_ERROR] Error during MQTTClient connect initiation: {e}")
@@ -102,19 +106,14 @@ def main():
 
 
     # --- 6. Keep Main Thread Alive & Handle Shutdown ---
+    signal.signal(signal.SIGTERM, _handle_sigterm)
     if DEBUG_LOGGING_ENABLED:
         print("[MAIN] Application running. Press Ctrl+C to exit.")
 
     try:
-        while not stop_event.is_set():
-            # The main loop can also periodically check health of threads
-            # For now, just sleep and let stop_event handle termination
-            # Example: check if threads are alive
-            # for t in threads:
-            #     if not t.is_alive() and t in threading.enumerate(): # Check if it was started and died
-            #         print(f"[MAIN_WARN] Thread {t.name} is no longer alive!")
-            #         # Potentially try to restart it, or signal a critical error
-            time.sleep(1)
+        # Block until stop is requested; Ctrl+C still interrupts the wait on POSIX.
+        # (If thread health checks are added later, use stop_event.wait(timeout) in a loop here.)
+        stop_event.wait()
     except KeyboardInterrupt:
         if DEBUG_LOGGING_ENABLED:
             print("\n[MAIN_SHUTDOWN] Ctrl+C received. Initiating shutdown sequence...")
@@ -124,6 +123,7 @@ def main():
         if DEBUG_LOGGING_ENABLED:
             print("[MAIN_SHUTDOWN] Setting stop event for all threads...")
         stop_event.set()
+        system_state.state_change_event.set() # Wake the control loop so it sees stop_event immediately
 
         # Disconnect MQTT client first
         if 'mqtt_client' in locals() and mqtt_client:
@@ -142,6 +142,9 @@ def main():
                 if thread.is_alive():
                     print(f"[MAIN_SHUTDOWN_WARN] Thread {thread.name} did not terminate gracefully.")
         
+        # The control loop flushes changed settings on an interval; write anything still pending before exit.
+        system_state.maybe_flush_persistent(force=True)
+
         # GPIO cleanup is now handled by the controller_loop's finally block when it exits.
         # If controller_thread might not have started or run, an explicit call might be needed here as a fallback.
         # However, if controller_loop started, its cleanup is preferred.
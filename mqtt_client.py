@@ -1,7 +1,8 @@
 # mqtt_client.py
 
+import threading
 import time
-import json
+from functools import partial
 import paho.mqtt.client as mqtt
 from config import (
     DEBUG_LOGGING_ENABLED,
@@ -11,15 +12,47 @@ from config import (
     MQTT_PASSWORD,
     MQTT_CLIENT_ID,
     TOPIC_AVAILABILITY,
-    CONTROL_TOPIC_BASE,
-    STATUS_TOPIC_BASE,
     TEMP_TOPIC_BASE,
     TOPIC_EXTERNAL_AHU_CALL,
+    TOPIC_SETPOINT,
+    TOPIC_DIFFERENTIAL,
+    TOPIC_AMBIENT_LOCKOUT_SETPOINT,
+    TOPIC_OVERRIDES,
+    TOPIC_RESEND_DISCOVERY,
+    TOPIC_STATUS_COOLING_CALL_ACTIVE,
+    TOPIC_STATUS_PUMP_RELAY,
+    TOPIC_STATUS_CONDENSER_RELAY,
+    TOPIC_STATUS_CRITICAL_SENSOR_FAULT,
+    TOPIC_STATUS_AMBIENT_LOCKOUT_ACTIVE,
+    QOS_FAST,
+    QOS_RELIABLE,
+    TEMP_PUBLISH_DEADBAND_F,
+    SENSOR_POLL_INTERVAL_SEC,
     MQTT_STATUS_PUBLISH_INTERVAL_SEC 
 )
 from state import SystemState 
 from mqtt_discovery import DiscoveryPublisher
 
+# Periodic status publishes skip retained values that haven't changed; every Nth one re-sends everything anyway.
+FULL_STATE_REFRESH_EVERY = 10
+
+# Temperatures within the deadband of the last published value are skipped, but never for longer than this,
+# so HA's expire_after (3 poll intervals + 5s, see mqtt_discovery.py) doesn't mark a steady sensor unavailable.
+TEMP_MAX_SILENCE_SEC = SENSOR_POLL_INTERVAL_SEC * 2
+
+# Payloads are published as UTF-8 bytes (Paho would encode str itself); the constant ones are encoded once here.
+PAYLOAD_ON = b"ON"
+PAYLOAD_OFF = b"OFF"
+PAYLOAD_ONLINE = b"online"
+PAYLOAD_OFFLINE = b"offline"
+OVERRIDE_PAYLOADS = {None: b"auto", "on": b"on", "off": b"off"}
+# Incoming override commands, matched on the lower-cased raw bytes; anything else means auto (as SystemState.set_override does).
+OVERRIDE_COMMANDS = {b"on": "on", b"off": "off"}
+
+def _override_payload(override_val):
+    payload = OVERRIDE_PAYLOADS.get(override_val)
+    return payload if payload is not None else str(override_val).encode() # e.g. a hand-edited overrides.json
+
 class MQTTClient:
     def __init__(self, state: SystemState):
         self.state = state
@@ -31,33 +64,68 @@ class MQTTClient:
         if MQTT_USERNAME and MQTT_PASSWORD:
             self.client.username_pw_set(MQTT_USERNAME, MQTT_PASSWORD)
 
+        # Sized for this device: a full state publish is ~a dozen messages, so a small inflight window is
+        # plenty, and a bounded queue keeps memory flat during a broker outage (Paho's default is unbounded).
+        self.client.max_inflight_messages_set(10)
+        self.client.max_queued_messages_set(100)
+        self.client.reconnect_delay_set(min_delay=1, max_delay=30)
+
         self.client.on_connect = self._on_connect
         self.client.on_disconnect = self._on_disconnect
         self.client.on_message = self._on_message
 
-        self.client.will_set(TOPIC_AVAILABILITY, payload="offline", qos=1, retain=True)
+        self.client.will_set(TOPIC_AVAILABILITY, payload=PAYLOAD_OFFLINE, qos=QOS_RELIABLE, retain=True)
 
         self.connected = False
-        self._stop_status_loop = False
+        self.connected_event = threading.Event() # Set in _on_connect; lets callers wait for the broker instead of sleeping
+        self._status_loop_stop = threading.Event() # Set by disconnect(); wakes the status loop immediately
         self.status_thread = None
+        self._temp_topics = {} # internal sensor key -> state topic, filled on first publish
+        self._last_temp = {} # internal sensor key -> (last published value, monotonic time published)
+        self._last_published = {} # retained topic -> last payload sent; cleared on (re)connect
+        self._publishes_since_full_refresh = 0
+        self._resync_pending = False # Set on (re)connect / resend request; the status thread does the full resync
+
+        # Incoming topic -> handler(payload bytes); one dict lookup per message instead of an if/elif chain.
+        # Handlers decode the payload themselves only when they need text.
+        self._handlers = {
+            f"{TOPIC_SETPOINT}/set": self._handle_setpoint,
+            f"{TOPIC_DIFFERENTIAL}/set": self._handle_differential,
+            f"{TOPIC_AMBIENT_LOCKOUT_SETPOINT}/set": self._handle_ambient_lockout_setpoint,
+            TOPIC_RESEND_DISCOVERY: self._handle_resend_discovery,
+            TOPIC_EXTERNAL_AHU_CALL: self._handle_ahu_call,
+        }
+        for device_key, override_topic in TOPIC_OVERRIDES.items():
+            self._handlers[f"{override_topic}/set"] = partial(self._handle_override, device_key)
+        # Everything we handle is subscribed to in a single SUBSCRIBE packet on (re)connect.
+        self._subscriptions = [(topic, QOS_RELIABLE) for topic in self._handlers]
 
 
     def connect(self):
         if self.debug:
             print(f"[MQTT] Attempting to connect to broker {MQTT_BROKER_ADDRESS}:{MQTT_BROKER_PORT} as {self.client_id}")
         try:
-            self.client.connect(MQTT_BROKER_ADDRESS, MQTT_BROKER_PORT, 60)
+            # connect_async() only records the target; the loop_start() thread makes the connection and keeps
+            # retrying with the reconnect_delay_set() backoff, so a broker that is down at boot is picked up later.
+            self.client.connect_async(MQTT_BROKER_ADDRESS, MQTT_BROKER_PORT, 60)
             self.client.loop_start() 
         except Exception as e:
             print(f"[MQTT_ERROR] Connection failed: {e}")
 
+        # One status publisher thread for the life of the client; it idles while disconnected
+        # rather than being torn down and re-created on every reconnect.
+        if self.status_thread is None:
+            self.status_thread = threading.Thread(target=self._periodic_status_publisher_loop, name="MQTTStatusThread", daemon=True)
+            self.status_thread.start()
+
     def disconnect(self):
         if self.debug:
             print("[MQTT] Disconnecting from broker...")
-        self._stop_status_loop = True
+        self._status_loop_stop.set()
+        self.state.status_publish_event.set() # Wake the status loop so it sees the stop request
         if self.status_thread and self.status_thread.is_alive():
             self.status_thread.join(timeout=5) 
-        self.publish_availability("offline") 
+        self.publish_availability(PAYLOAD_OFFLINE) 
         self.client.loop_stop() 
         self.client.disconnect()
         if self.debug:
@@ -70,38 +138,25 @@ class MQTTClient:
                 print(f"[MQTT] Connected to broker successfully (rc={rc})")
             self.state.update_mqtt_timestamp() 
 
-            self.client.subscribe(f"{CONTROL_TOPIC_BASE}/setpoint/set", qos=1)
-            self.client.subscribe(f"{CONTROL_TOPIC_BASE}/differential/set", qos=1)
-            self.client.subscribe(f"{CONTROL_TOPIC_BASE}/ambient_lockout_setpoint/set", qos=1) # <-- NEW SUBSCRIPTION
-            self.client.subscribe(f"{CONTROL_TOPIC_BASE}/pump_override/set", qos=1)
-            self.client.subscribe(f"{CONTROL_TOPIC_BASE}/chiller_override/set", qos=1) 
-            self.client.subscribe(f"{CONTROL_TOPIC_BASE}/cooling_override/set", qos=1)
-            self.client.subscribe(f"{CONTROL_TOPIC_BASE}/resend_discovery", qos=1)
-            self.client.subscribe(TOPIC_EXTERNAL_AHU_CALL, qos=1) 
+            self.client.subscribe(self._subscriptions)
 
             if self.debug:
                 print("[MQTT] Subscribed to command topics.")
 
-            self.publish_availability("online")
+            # Availability, discovery and the full state resync are handed to the status thread so this
+            # callback returns straight away and doesn't hold up Paho's network loop.
+            self._request_resync()
 
-            if not self.discovery_publisher:
-                 self.discovery_publisher = DiscoveryPublisher(self.client)
-            self.discovery_publisher.publish_all()
-
-            self.publish_all_states()
-
-            if self.status_thread is None or not self.status_thread.is_alive():
-                self._stop_status_loop = False
-                import threading 
-                self.status_thread = threading.Thread(target=self._periodic_status_publisher_loop, daemon=True)
-                self.status_thread.start()
+            self.connected_event.set()
 
         else:
             self.connected = False
+            self.connected_event.clear()
             print(f"[MQTT_ERROR] Connection failed with code {rc}. Check MQTT broker settings and credentials.")
 
     def _on_disconnect(self, client, userdata, rc):
         self.connected = False
+        self.connected_event.clear()
         if rc != 0:
             print(f"[MQTT_WARNING] Unexpectedly disconnected from broker (rc={rc}). Will attempt to reconnect automatically.")
         else:
@@ -111,117 +166,183 @@ class MQTTClient:
     def _on_message(self, client, userdata, msg):
         topic = msg.topic
         try:
-            payload_str = msg.payload.decode('utf-8')
+            payload = msg.payload
             if self.debug:
-                print(f"[MQTT_RX] Received message on topic '{topic}': {payload_str}")
+                print(f"[MQTT_RX] Received message on topic '{topic}': {payload.decode('utf-8', 'replace')}")
             self.state.update_mqtt_timestamp() 
 
-            if topic == f"{CONTROL_TOPIC_BASE}/setpoint/set":
-                self.state.set_setpoint(payload_str)
-                self.publish_state(f"{CONTROL_TOPIC_BASE}/setpoint", self.state.setpoint) 
-
-            elif topic == f"{CONTROL_TOPIC_BASE}/differential/set":
-                self.state.set_differential(payload_str)
-                self.publish_state(f"{CONTROL_TOPIC_BASE}/differential", self.state.differential)
-            
-            # <-- NEW HANDLER for Ambient Lockout Setpoint -->
-            elif topic == f"{CONTROL_TOPIC_BASE}/ambient_lockout_setpoint/set":
-                self.state.set_ambient_lockout_setpoint(payload_str)
-                self.publish_state(f"{CONTROL_TOPIC_BASE}/ambient_lockout_setpoint", self.state.ambient_lockout_setpoint)
-
-            elif topic.endswith("_override/set"):
-                device_key = topic.split('/')[-2].replace("_override", "") 
-                effective_payload = None if payload_str.lower() == "auto" else payload_str
-                self.state.set_override(device_key, effective_payload)
-                current_override_state = self.state.get_override(device_key)
-                publish_payload = "auto" if current_override_state is None else current_override_state
-                self.publish_state(f"{CONTROL_TOPIC_BASE}/{device_key}_override", publish_payload)
-
-
-            elif topic == f"{CONTROL_TOPIC_BASE}/resend_discovery":
-                if payload_str.upper() == "PRESS": 
-                    if self.debug: print("[MQTT] Resend discovery command received.")
-                    if self.discovery_publisher:
-                        self.discovery_publisher.publish_all()
-                    self.publish_availability("online") 
-                    self.publish_all_states() 
-
-            elif topic == TOPIC_EXTERNAL_AHU_CALL:
-                if payload_str: 
-                    if self.debug: print(f"[MQTT] External AHU call received: {payload_str}")
-                    self.state.update_ahu_call(is_manual_cooling=False)
-
-        except json.JSONDecodeError:
-            if self.debug: print(f"[MQTT_ERROR] JSON decode error for payload on topic {topic}: {payload_str}")
+            handler = self._handlers.get(topic)
+            if handler is not None:
+                handler(payload)
+
         except Exception as e:
             print(f"[MQTT_ERROR] Error processing message on topic {topic}: {e}")
 
+    # --- Incoming Message Handlers (see self._handlers) ---
+
+    def _handle_setpoint(self, payload):
+        self.state.set_setpoint(payload.decode('utf-8'))
+        self.publish_state(TOPIC_SETPOINT, self.state.setpoint) 
+
+    def _handle_differential(self, payload):
+        self.state.set_differential(payload.decode('utf-8'))
+        self.publish_state(TOPIC_DIFFERENTIAL, self.state.differential)
 
-    def publish_state(self, topic, value, retain=True, qos=1):
+    def _handle_ambient_lockout_setpoint(self, payload):
+        self.state.set_ambient_lockout_setpoint(payload.decode('utf-8'))
+        self.publish_state(TOPIC_AMBIENT_LOCKOUT_SETPOINT, self.state.ambient_lockout_setpoint)
+
+    def _handle_override(self, device_key, payload):
+        self.state.set_override(device_key, OVERRIDE_COMMANDS.get(payload.strip().lower()))
+        self.publish_state(TOPIC_OVERRIDES[device_key], _override_payload(self.state.get_override(device_key)))
+
+    def _handle_resend_discovery(self, payload):
+        if payload.upper() == b"PRESS": # Compared as bytes; no decode needed
+            if self.debug: print("[MQTT] Resend discovery command received.")
+            self._request_resync()
+
+    def _handle_ahu_call(self, payload):
+        if payload: # Any non-empty payload is a call; only its presence matters
+            if self.debug: print(f"[MQTT] External AHU call received: {payload.decode('utf-8', 'replace')}")
+            self.state.update_ahu_call(is_manual_cooling=False)
+
+
+    def publish_state(self, topic, value, retain=True, qos=QOS_RELIABLE):
         if not self.connected:
             # if self.debug: print(f"[MQTT_WARN] Not connected, cannot publish to {topic}") # Can be spammy
             return
         try:
-            payload = str(value) # Ensure payload is string
-            # For boolean values that need to be "ON"/"OFF" for binary_sensors
-            if isinstance(value, bool):
-                payload = "ON" if value else "OFF"
+            # Booleans become "ON"/"OFF" for binary_sensors; bytes pass through; anything else is str()-encoded.
+            if value is True:
+                payload = PAYLOAD_ON
+            elif value is False:
+                payload = PAYLOAD_OFF
+            elif isinstance(value, bytes):
+                payload = value
+            else:
+                payload = str(value).encode()
 
             self.client.publish(topic, payload, qos=qos, retain=retain)
+            if retain:
+                self._last_published[topic] = payload
             if self.debug:
-                print(f"[MQTT_TX] Published to {topic}: {payload} (retain={retain})")
+                print(f"[MQTT_TX] Published to {topic}: {payload.decode()} (retain={retain})")
         except Exception as e:
             print(f"[MQTT_ERROR] Failed to publish to {topic}: {e}")
 
-    def publish_availability(self, status="online"):
+    def publish_availability(self, status=PAYLOAD_ONLINE):
         self.publish_state(TOPIC_AVAILABILITY, status, retain=True)
 
-    def publish_all_states(self):
+    def publish_all_states(self, force=False):
+        """
+        Publishes the current state snapshot. Retained values identical to what was last sent are skipped
+        unless force is True or a periodic full refresh is due; non-retained temperatures always go out.
+        """
         if not self.connected:
             return
 
-        if self.debug:
-            print("[MQTT] Publishing all current states...")
+        self._publishes_since_full_refresh += 1
+        if force or self._publishes_since_full_refresh >= FULL_STATE_REFRESH_EVERY:
+            self._last_published.clear()
+            self._publishes_since_full_refresh = 0
 
-        self.publish_state(f"{CONTROL_TOPIC_BASE}/setpoint", f"{self.state.setpoint:.1f}")
-        self.publish_state(f"{CONTROL_TOPIC_BASE}/differential", f"{self.state.differential:.1f}")
-        self.publish_state(f"{CONTROL_TOPIC_BASE}/ambient_lockout_setpoint", f"{self.state.ambient_lockout_setpoint:.1f}") # <-- NEW PUBLISH
+        state = self.state
+        # Build the whole snapshot first as (topic, payload, qos, retain), then hand it to Paho
+        # back-to-back so its network thread can drain the batch in as few socket writes as possible.
+        messages = [
+            (TOPIC_SETPOINT, f"{state.setpoint:.1f}".encode(), QOS_RELIABLE, True),
+            (TOPIC_DIFFERENTIAL, f"{state.differential:.1f}".encode(), QOS_RELIABLE, True),
+            (TOPIC_AMBIENT_LOCKOUT_SETPOINT, f"{state.ambient_lockout_setpoint:.1f}".encode(), QOS_RELIABLE, True),
+        ]
 
-        for device in ["pump", "chiller", "cooling"]:
-            override_val = self.state.get_override(device) 
-            publish_payload = "auto" if override_val is None else override_val
-            self.publish_state(f"{CONTROL_TOPIC_BASE}/{device}_override", publish_payload)
+        for device, override_topic in TOPIC_OVERRIDES.items():
+            messages.append((override_topic, _override_payload(state.get_override(device)), QOS_RELIABLE, True))
 
-        temps = self.state.get_all_temperatures() 
+        temps = state.get_all_temperatures() 
         for key, temp_val in temps.items():
             if temp_val is not None: 
-                self.publish_state(f"{TEMP_TOPIC_BASE}/{key}", f"{temp_val:.2f}", retain=False, qos=0) 
+                messages.append((self._temp_topic(key), f"{temp_val:.2f}".encode(), QOS_FAST, False))
+
+        # Binary Status Sensors - "ON"/"OFF" for HA binary_sensors.
+        # QoS 0: these are sampled state that is re-sent on change and on every full refresh, so a lost
+        # message is corrected without PUBACK bookkeeping. Still retained so HA picks up the current value
+        # after it restarts (temperatures instead rely on frequent updates plus expire_after).
+        messages.append((TOPIC_STATUS_COOLING_CALL_ACTIVE, PAYLOAD_ON if state.is_ahu_calling else PAYLOAD_OFF, QOS_FAST, True))
+        messages.append((TOPIC_STATUS_PUMP_RELAY, PAYLOAD_ON if state.pump_relay else PAYLOAD_OFF, QOS_FAST, True))
+        messages.append((TOPIC_STATUS_CONDENSER_RELAY, PAYLOAD_ON if state.condenser_relay else PAYLOAD_OFF, QOS_FAST, True))
+        messages.append((TOPIC_STATUS_CRITICAL_SENSOR_FAULT, PAYLOAD_ON if state.critical_sensor_fault else PAYLOAD_OFF, QOS_FAST, True))
+        messages.append((TOPIC_STATUS_AMBIENT_LOCKOUT_ACTIVE, PAYLOAD_ON if state.ambient_lockout_active else PAYLOAD_OFF, QOS_FAST, True))
+        # Availability is not part of the snapshot: it is asserted once per session by _publish_full_resync()
+        # and withdrawn by disconnect() / the LWT.
+
+        publish = self.client.publish
+        last_published = self._last_published
+        sent = []
+        for topic, payload, qos, retain in messages:
+            if retain and last_published.get(topic) == payload:
+                continue # Broker already holds this retained value
+            try:
+                publish(topic, payload, qos=qos, retain=retain)
+            except Exception as e:
+                print(f"[MQTT_ERROR] Failed to publish to {topic}: {e}")
+                continue
+            if retain:
+                last_published[topic] = payload
+            sent.append((topic, payload))
 
-        # Binary Status Sensors - publish_state handles bool to "ON"/"OFF"
-        self.publish_state(f"{STATUS_TOPIC_BASE}/cooling_call_active", self.state.is_ahu_calling)
-        self.publish_state(f"{STATUS_TOPIC_BASE}/pump_relay_state", self.state.get_relay_state("pump"))
-        self.publish_state(f"{STATUS_TOPIC_BASE}/condenser_relay_state", self.state.get_relay_state("condenser"))
-        self.publish_state(f"{STATUS_TOPIC_BASE}/critical_sensor_fault", self.state.is_critical_sensor_fault())
-        self.publish_state(f"{STATUS_TOPIC_BASE}/ambient_lockout_active", self.state.ambient_lockout_active) # <-- NEW PUBLISH
+        if self.debug:
+            # One summary line instead of a print per message.
+            print(f"[MQTT_TX] Published {len(sent)} of {len(messages)} states: " + ", ".join(f"{topic}={payload.decode()}" for topic, payload in sent))
 
-        self.publish_availability("online") 
 
-        if self.debug:
-            print("[MQTT] Finished publishing all current states.")
+    def _request_resync(self):
+        self._resync_pending = True
+        self.state.status_publish_event.set() # Wake the status thread
+
+    def _publish_full_resync(self):
+        """Availability, HA discovery and every state value; run by the status thread after (re)connect."""
+        self.publish_availability(PAYLOAD_ONLINE)
 
+        if not self.discovery_publisher:
+             self.discovery_publisher = DiscoveryPublisher(self.client)
+        self.discovery_publisher.publish_all()
+
+        self.publish_all_states(force=True) # New session: resync every retained value
 
     def _periodic_status_publisher_loop(self):
         if self.debug:
             print("[MQTT] Starting periodic status publisher loop.")
-        while not self._stop_status_loop and self.connected:
-            if self.state.should_publish_status(): 
+        publish_event = self.state.status_publish_event
+        while not self._status_loop_stop.is_set():
+            publish_due = self.state.should_publish_status()
+            if publish_event.is_set():
+                # A status flag changed; dirty tracking in publish_all_states() sends just what differs.
+                publish_event.clear()
+                publish_due = True
+            if self._resync_pending and self.connected:
+                self._resync_pending = False
+                self._publish_full_resync() # Includes everything a regular publish would send
+            elif publish_due and self.connected: # While disconnected, the resync on reconnect covers it
                 self.publish_all_states()
-            time.sleep(1) 
+            # Sleep until the next periodic publish is due or a status flag changes, instead of
+            # waking every second to ask; disconnect() also sets the event so shutdown is immediate.
+            publish_event.wait(self.state.seconds_until_status_publish())
         if self.debug:
             print("[MQTT] Exiting periodic status publisher loop.")
 
 
+    def _temp_topic(self, internal_sensor_key):
+        topic = self._temp_topics.get(internal_sensor_key)
+        if topic is None:
+            topic = self._temp_topics[internal_sensor_key] = f"{TEMP_TOPIC_BASE}/{internal_sensor_key}"
+        return topic
+
     def publish_temperature(self, internal_sensor_key, temp_value):
         if temp_value is not None and isinstance(temp_value, (float, int)):
-            self.publish_state(f"{TEMP_TOPIC_BASE}/{internal_sensor_key}", f"{temp_value:.2f}", retain=False, qos=0)
+            now = time.monotonic()
+            last = self._last_temp.get(internal_sensor_key)
+            if last is not None and abs(last[0] - temp_value) < TEMP_PUBLISH_DEADBAND_F and now - last[1] < TEMP_MAX_SILENCE_SEC:
+                return # Not a meaningful change and HA's copy is still fresh
+            self._last_temp[internal_sensor_key] = (temp_value, now)
+            self.publish_state(self._temp_topic(internal_sensor_key), f"{temp_value:.2f}", retain=False, qos=QOS_FAST)
         # else: No need to log invalid temp here, state.py or sensors.py might do it.
\ No newline at end of file
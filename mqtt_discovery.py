@@ -6,9 +6,18 @@ from config import (
     MQTT_BASE_TOPIC,
     HA_DISCOVERY_PREFIX,
     TOPIC_AVAILABILITY,
-    CONTROL_TOPIC_BASE,
-    STATUS_TOPIC_BASE,
+    QOS_RELIABLE,
     TEMP_TOPIC_BASE,
+    TOPIC_SETPOINT,
+    TOPIC_DIFFERENTIAL,
+    TOPIC_AMBIENT_LOCKOUT_SETPOINT,
+    TOPIC_OVERRIDES,
+    TOPIC_RESEND_DISCOVERY,
+    TOPIC_STATUS_COOLING_CALL_ACTIVE,
+    TOPIC_STATUS_PUMP_RELAY,
+    TOPIC_STATUS_CONDENSER_RELAY,
+    TOPIC_STATUS_CRITICAL_SENSOR_FAULT,
+    TOPIC_STATUS_AMBIENT_LOCKOUT_ACTIVE,
     SENSOR_IDS,
     SENSOR_FRIENDLY_NAMES,
     SENSOR_POLL_INTERVAL_SEC # Used for expire_after
@@ -22,41 +31,55 @@ DEVICE_INFO = {
     "sw_version": "0.1.0" # Update as your software evolves (e.g., "0.2.0" after this feature)
 }
 
+# Fields every entity's discovery config shares.
+_COMMON_FIELDS = {
+    "availability_topic": TOPIC_AVAILABILITY,
+    "device": DEVICE_INFO
+}
+
 class DiscoveryPublisher:
     def __init__(self, mqtt_client):
         self.client = mqtt_client
         self.debug = DEBUG_LOGGING_ENABLED
         self.discovery_prefix = HA_DISCOVERY_PREFIX.rstrip('/')
         self.base_topic_prefix = MQTT_BASE_TOPIC.rstrip('/')
-
-    def _publish_config(self, entity_type, component_name, config_payload):
-        config_payload["availability_topic"] = TOPIC_AVAILABILITY
+        # "<prefix>/{entity_type}/<base>/{component_name}/config", with the fixed parts filled in once
+        self._config_topic_fmt = f"{self.discovery_prefix}/{{}}/{self.base_topic_prefix}/{{}}/config"
+
+        # Discovery configs only depend on config.py, so build every (topic, payload bytes) once;
+        # publish_all() (startup, reconnects, resend button) then just hands them to the client.
+        self._messages = []
+        self._add_temperature_sensors()
+        self._add_setpoint_number()
+        self._add_differential_number()
+        self._add_ambient_lockout_number()
+        self._add_override_selects()
+        self._add_status_binary_sensors()
+        self._add_resend_discovery_button()
+
+    def _add_config(self, entity_type, component_name, config_payload):
         # Ensure unique_id uses base_topic_prefix for global uniqueness if multiple chillers on one HA
-        config_payload["unique_id"] = f"{self.base_topic_prefix}_{component_name}"
-        config_payload["device"] = DEVICE_INFO 
+        config_payload = {**_COMMON_FIELDS, **config_payload, "unique_id": f"{self.base_topic_prefix}_{component_name}"}
 
-        topic = f"{self.discovery_prefix}/{entity_type}/{self.base_topic_prefix}/{component_name}/config"
-        payload_json = json.dumps(config_payload)
-        self.client.publish(topic, payload_json, retain=True)
-        if self.debug:
-            print(f"[DISCOVERY] Published to {topic}: {payload_json}")
+        topic = self._config_topic_fmt.format(entity_type, component_name)
+        # Compact separators and raw UTF-8 (e.g. "°F" rather than "\u00b0F") keep each retained config small.
+        payload = json.dumps(config_payload, separators=(",", ":"), ensure_ascii=False).encode()
+        self._messages.append((topic, payload))
 
     def publish_all(self):
         if self.debug:
             print("[DISCOVERY] Publishing all Home Assistant discovery messages...")
 
-        self.publish_temperature_sensors()
-        self.publish_setpoint_number()
-        self.publish_differential_number()
-        self.publish_ambient_lockout_number() # <-- NEW CALL
-        self.publish_override_selects()
-        self.publish_status_binary_sensors() # Will add new lockout status here
-        self.publish_resend_discovery_button()
+        publish = self.client.publish
+        for topic, payload in self._messages:
+            publish(topic, payload, qos=QOS_RELIABLE, retain=True) # A lost config would leave the entity missing in HA
+            if self.debug:
+                print(f"[DISCOVERY] Published to {topic}: {payload.decode()}")
 
         if self.debug:
             print("[DISCOVERY] All discovery messages published.")
 
-    def publish_temperature_sensors(self):
+    def _add_temperature_sensors(self):
         if not SENSOR_IDS:
             if self.debug:
                 print("[DISCOVERY] No sensor IDs configured. Skipping temperature sensor discovery.")
@@ -80,14 +103,14 @@ class DiscoveryPublisher:
                 "value_template": "{{ value | float(default=None) }}", 
                 "expire_after": int(SENSOR_POLL_INTERVAL_SEC * 3 + 5) 
             }
-            self._publish_config("sensor", component_name, payload)
+            self._add_config("sensor", component_name, payload)
 
-    def publish_setpoint_number(self):
+    def _add_setpoint_number(self):
         component_name = "setpoint"
         payload = {
             "name": "Chiller Target Setpoint",
-            "state_topic": f"{CONTROL_TOPIC_BASE}/setpoint",
-            "command_topic": f"{CONTROL_TOPIC_BASE}/setpoint/set", 
+            "state_topic": TOPIC_SETPOINT,
+            "command_topic": f"{TOPIC_SETPOINT}/set", 
             "min": 30,  
             "max": 70,  
             "step": 0.5,
@@ -95,14 +118,14 @@ class DiscoveryPublisher:
             "mode": "box", 
             "icon": "mdi:thermometer-lines"
         }
-        self._publish_config("number", component_name, payload)
+        self._add_config("number", component_name, payload)
 
-    def publish_differential_number(self):
+    def _add_differential_number(self):
         component_name = "differential"
         payload = {
             "name": "Chiller Temperature Differential",
-            "state_topic": f"{CONTROL_TOPIC_BASE}/differential",
-            "command_topic": f"{CONTROL_TOPIC_BASE}/differential/set", 
+            "state_topic": TOPIC_DIFFERENTIAL,
+            "command_topic": f"{TOPIC_DIFFERENTIAL}/set", 
             "min": 1.0, 
             "max": 10.0, 
             "step": 0.1,
@@ -110,16 +133,16 @@ class DiscoveryPublisher:
             "mode": "box",
             "icon": "mdi:swap-vertical-bold"
         }
-        self._publish_config("number", component_name, payload)
+        self._add_config("number", component_name, payload)
 
     # <-- NEW METHOD for Ambient Lockout Setpoint -->
-    def publish_ambient_lockout_number(self):
+    def _add_ambient_lockout_number(self):
         """Publish discovery for the ambient temperature lockout setpoint control."""
         component_name = "ambient_lockout_setpoint"
         payload = {
             "name": "Ambient Lockout Temperature",
-            "state_topic": f"{CONTROL_TOPIC_BASE}/ambient_lockout_setpoint",
-            "command_topic": f"{CONTROL_TOPIC_BASE}/ambient_lockout_setpoint/set",
+            "state_topic": TOPIC_AMBIENT_LOCKOUT_SETPOINT,
+            "command_topic": f"{TOPIC_AMBIENT_LOCKOUT_SETPOINT}/set",
             "min": 30,  # °F - Allow setting very low to effectively disable
             "max": 80,  # °F - Reasonable upper limit
             "step": 1.0,
@@ -127,9 +150,9 @@ class DiscoveryPublisher:
             "mode": "box", 
             "icon": "mdi:account-lock-outline" # Icon suggesting environmental lockout
         }
-        self._publish_config("number", component_name, payload)
+        self._add_config("number", component_name, payload)
 
-    def publish_override_selects(self):
+    def _add_override_selects(self):
         devices = {
             "pump": "Pump",
             "chiller": "Chiller", 
@@ -139,70 +162,68 @@ class DiscoveryPublisher:
             component_name = f"{internal_key}_override"
             payload = {
                 "name": f"{friendly_prefix} Manual Override",
-                "state_topic": f"{CONTROL_TOPIC_BASE}/{internal_key}_override", 
-                "command_topic": f"{CONTROL_TOPIC_BASE}/{internal_key}_override/set", 
+                "state_topic": TOPIC_OVERRIDES[internal_key], 
+                "command_topic": f"{TOPIC_OVERRIDES[internal_key]}/set", 
                 "options": ["auto", "on", "off"], 
                 "icon": "mdi:tune" if internal_key != "cooling" else "mdi:snowflake-thermometer"
             }
-            self._publish_config("select", component_name, payload)
+            self._add_config("select", component_name, payload)
 
-    def publish_status_binary_sensors(self):
+    def _add_status_binary_sensors(self):
         statuses = {
             "cooling_call_active": {
                 "name": "Chiller Cooling Call Active",
                 "icon": "mdi:snowflake-alert",
-                "topic_suffix": "cooling_call_active"
+                "state_topic": TOPIC_STATUS_COOLING_CALL_ACTIVE
             },
             "pump_relay_status": {
                 "name": "Chiller Pump Relay Engaged",
                 "icon": "mdi:pump",
-                "topic_suffix": "pump_relay_state" 
+                "state_topic": TOPIC_STATUS_PUMP_RELAY
             },
             "condenser_relay_status": {
                 "name": "Chiller Condenser Relay Engaged",
                 "icon": "mdi:air-conditioner",
-                "topic_suffix": "condenser_relay_state" 
+                "state_topic": TOPIC_STATUS_CONDENSER_RELAY
             },
             "critical_sensor_fault": {
                 "name": "Chiller Critical Sensor Fault",
                 "icon": "mdi:alert-circle-outline",
                 "device_class": "problem", 
-                "topic_suffix": "critical_sensor_fault"
+                "state_topic": TOPIC_STATUS_CRITICAL_SENSOR_FAULT
             },
             # <-- NEW Binary Sensor for Ambient Lockout Status -->
             "ambient_lockout_status": {
                 "name": "Chiller Ambient Lockout Active",
                 "icon": "mdi:weather-sunny-off", # Or mdi:cancel, mdi:block-helper
-                "device_class": "running", # Shows as "Running" / "Not Running". "Problem" could also work.
-                                           # If "Problem", ON means there is a problem (lockout is active).
-                                           # If "Running", ON means it IS running (i.e. lockout NOT active).
-                                           # Let's use "power" so ON means lockout is ON (active/powered).
+                # "power" so ON reads as lockout active; "running" would invert the meaning
+                # (ON = running) and "problem" would flag a normal weather lockout as a fault.
                 "device_class": "power", # ON = Lockout is active (system is "powered" down by lockout)
                                          # OFF = Lockout is not active (system can run normally)
 
-                "topic_suffix": "ambient_lockout_active"
+                "state_topic": TOPIC_STATUS_AMBIENT_LOCKOUT_ACTIVE
             }
         }
 
         for component_name, details in statuses.items():
             payload = {
                 "name": details["name"],
-                "state_topic": f"{STATUS_TOPIC_BASE}/{details['topic_suffix']}", 
+                "state_topic": details["state_topic"], 
                 "payload_on": "ON",  
                 "payload_off": "OFF", 
                 "icon": details.get("icon")
             }
             if "device_class" in details:
                 payload["device_class"] = details["device_class"]
-            self._publish_config("binary_sensor", component_name, payload)
+            self._add_config("binary_sensor", component_name, payload)
 
 
-    def publish_resend_discovery_button(self):
+    def _add_resend_discovery_button(self):
         component_name = "resend_discovery"
         payload = {
             "name": "Chiller Resend HA Discovery",
-            "command_topic": f"{CONTROL_TOPIC_BASE}/resend_discovery",
+            "command_topic": TOPIC_RESEND_DISCOVERY,
             "payload_press": "PRESS", 
             "icon": "mdi:refresh-auto"
         }
-        self._publish_config("button", component_name, payload)
\ No newline at end of file
+        self._add_config("button", component_name, payload)
\ No newline at end of file
@@ -3,6 +3,7 @@
 import time
 import glob
 import os
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from config import (
     DEBUG_LOGGING_ENABLED,
     SENSOR_IDS,
@@ -15,14 +16,68 @@ from config import (
 # Base path for 1-Wire devices on Raspberry Pi
 W1_BASE_DIR = "/sys/bus/w1/devices/"
 
+# Each w1_slave read blocks ~750ms while the DS18B20 converts; reading every sensor on its own worker overlaps
+# those waits, so a poll takes about one conversion time instead of one per sensor. Workers start lazily.
+_READ_POOL = ThreadPoolExecutor(max_workers=max(1, len(SENSOR_IDS)), thread_name_prefix="SensorRead")
+SENSOR_READ_TIMEOUT_SEC = 2.0 # Per sensor; a read still pending after this counts as failed for this poll
+
+# w1_therm (Linux 5.10+) can start a conversion on every sensor of a bus with one write to the master's
+# therm_bulk_read node; each sensor's "temperature" file then returns the result without converting again.
+# Looked up once at import; on older kernels this is empty and every poll uses the w1_slave path.
+_BULK_READ_PATHS = glob.glob(os.path.join(W1_BASE_DIR, "w1_bus_master*", "therm_bulk_read"))
+BULK_CONVERSION_TIME_SEC = 0.75 # DS18B20 worst case at 12-bit resolution
+
+# Sysfs paths per sensor never change, so join them once: internal key -> (w1_slave path, temperature path).
+# Sensors with an empty HW ID in config are left out.
+_SENSOR_PATHS = {
+    internal_key: (os.path.join(W1_BASE_DIR, sensor_hw_id, "w1_slave"), os.path.join(W1_BASE_DIR, sensor_hw_id, "temperature"))
+    for internal_key, sensor_hw_id in SENSOR_IDS.items() if sensor_hw_id
+}
+
+def _read_sysfs(path, max_bytes=128):
+    """Reads a small sysfs file with one os.read(), skipping Python's buffered/text file object layers."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        return os.read(fd, max_bytes)
+    finally:
+        os.close(fd)
+
+_MILLI_C_TO_F = 9.0 / 5000.0 # (1/1000) * (9/5), folded into one factor
+
+def _milli_c_to_f(milli_c):
+    """Converts a raw 1-Wire reading in millidegrees Celsius to Fahrenheit, rounded to 2 places."""
+    return round(milli_c * _MILLI_C_TO_F + 32.0, 2)
+
+def _bulk_trigger_conversion():
+    """Starts a conversion on all sensors via therm_bulk_read. Returns False if no bus accepted the trigger."""
+    triggered = False
+    for bulk_path in _BULK_READ_PATHS:
+        try:
+            with open(bulk_path, "w") as f:
+                f.write("trigger\n")
+            triggered = True
+        except OSError as e:
+            if DEBUG_LOGGING_ENABLED:
+                print(f"[SENSORS_WARN] Bulk conversion trigger failed for {bulk_path}: {e}")
+    return triggered
+
+def _read_temp_from_temperature_file(temperature_file_path):
+    """
+    Reads a w1_therm "temperature" file (integer millidegrees C; the driver has already checked the CRC).
+    Returns temperature in Fahrenheit, or None if it is missing, empty or unparsable.
+    """
+    try:
+        return _milli_c_to_f(int(_read_sysfs(temperature_file_path)))
+    except (OSError, ValueError):
+        return None
+
 def _read_temp_from_path(sensor_file_path):
     """
     Reads and parses temperature from a specific 1-Wire sensor file.
     Returns temperature in Fahrenheit or None if an error occurs.
     """
     try:
-        with open(sensor_file_path, "r") as f:
-            lines = f.readlines()
+        data = _read_sysfs(sensor_file_path) # ~75 bytes of ASCII; parsed as bytes, no line list or str decode
     except FileNotFoundError:
         if DEBUG_LOGGING_ENABLED: # Use global debug flag if no state instance here
             print(f"[SENSORS_ERROR] Sensor file not found: {sensor_file_path}")
@@ -32,21 +87,19 @@ def _read_temp_from_path(sensor_file_path):
             print(f"[SENSORS_ERROR] Error reading sensor file {sensor_file_path}: {e}")
         return None
 
-    # Verify CRC check and temperature data
-    if lines[0].strip()[-3:] == "YES":
-        temp_line_pos = lines[1].find("t=")
-        if temp_line_pos != -1:
+    # Verify CRC check and temperature data: line 1 ends in "crc=xx YES", line 2 in "t=<millidegrees C>"
+    first_line_end = data.find(b"\n")
+    if first_line_end != -1 and data[:first_line_end].rstrip().endswith(b"YES"):
+        temp_pos = data.find(b"t=", first_line_end)
+        if temp_pos != -1:
             try:
-                temp_string = lines[1][temp_line_pos + 2:]
-                temp_c = float(temp_string) / 1000.0
-                temp_f = temp_c * 9.0 / 5.0 + 32.0
-                return round(temp_f, 2)
+                return _milli_c_to_f(int(data[temp_pos + 2:])) # int() accepts bytes and ignores the trailing newline
             except ValueError:
                 if DEBUG_LOGGING_ENABLED:
-                    print(f"[SENSORS_ERROR] Could not parse temperature from sensor {sensor_file_path}: {lines[1]}")
+                    print(f"[SENSORS_ERROR] Could not parse temperature from sensor {sensor_file_path}: {data[first_line_end + 1:].decode(errors='replace').strip()}")
                 return None
     if DEBUG_LOGGING_ENABLED:
-        print(f"[SENSORS_ERROR] CRC check failed or invalid data for sensor {sensor_file_path}: {lines[0]}")
+        print(f"[SENSORS_ERROR] CRC check failed or invalid data for sensor {sensor_file_path}: {data[:first_line_end].decode(errors='replace').strip()}")
     return None
 
 def read_all_configured_sensors():
@@ -65,17 +118,42 @@ def read_all_configured_sensors():
 
 
     for internal_key, sensor_hw_id in SENSOR_IDS.items():
+        temperatures[internal_key] = None # Keeps config order; filled in below once the read completes
         if not sensor_hw_id: # Skip if sensor ID is empty in config
              if DEBUG_LOGGING_ENABLED:
                   print(f"[SENSORS_WARN] HW ID for sensor '{internal_key}' is not configured. Skipping.")
-             temperatures[internal_key] = None
-             continue
 
-        sensor_file_path = os.path.join(W1_BASE_DIR, sensor_hw_id, "w1_slave")
-        temp_f = _read_temp_from_path(sensor_file_path)
+    # Fast path: one conversion for the whole bus, then a quick read of each result.
+    if _BULK_READ_PATHS and _bulk_trigger_conversion():
+        time.sleep(BULK_CONVERSION_TIME_SEC)
+        for internal_key, (_, temperature_path) in _SENSOR_PATHS.items():
+            temperatures[internal_key] = _read_temp_from_temperature_file(temperature_path)
+
+    # Anything the bulk read didn't produce (older kernel, sensor on a bus without the node, empty result)
+    # falls back to a regular w1_slave read, which converts on its own.
+    pending_reads = {}
+    for internal_key, (w1_slave_path, _) in _SENSOR_PATHS.items():
+        if temperatures[internal_key] is None:
+            pending_reads[internal_key] = _READ_POOL.submit(_read_temp_from_path, w1_slave_path)
+
+    for internal_key, future in pending_reads.items():
+        sensor_hw_id = SENSOR_IDS[internal_key]
+        try:
+            temp_f = future.result(timeout=SENSOR_READ_TIMEOUT_SEC)
+        except FutureTimeoutError:
+            if DEBUG_LOGGING_ENABLED:
+                print(f"[SENSORS_ERROR] Read of sensor '{internal_key}' ({sensor_hw_id}) timed out after {SENSOR_READ_TIMEOUT_SEC}s")
+            temp_f = None
+        except Exception as e:
+            if DEBUG_LOGGING_ENABLED:
+                print(f"[SENSORS_ERROR] Read of sensor '{internal_key}' ({sensor_hw_id}) failed: {e}")
+            temp_f = None
         temperatures[internal_key] = temp_f # Store temp or None if read failed
 
-        if DEBUG_LOGGING_ENABLED:
+    if DEBUG_LOGGING_ENABLED:
+        for internal_key in _SENSOR_PATHS:
+            temp_f = temperatures[internal_key]
+            sensor_hw_id = SENSOR_IDS[internal_key]
             if temp_f is not None:
                 print(f"[SENSORS] Read: {internal_key} ({sensor_hw_id}) = {temp_f:.2f}°F")
             else:
@@ -106,12 +184,8 @@ def sensor_loop(system_state, mqtt_client_instance, stop_event):
                 # mqtt_client.publish_temperature handles the None case
                 mqtt_client_instance.publish_temperature(internal_key, temp_f)
 
-        # Wait for the next polling interval
-        # Check stop_event frequently during sleep to allow faster shutdown
-        for _ in range(int(SENSOR_POLL_INTERVAL_SEC)):
-            if stop_event.is_set():
-                break
-            time.sleep(1)
+        # Wait for the next polling interval; returns immediately once stop_event is set
+        stop_event.wait(SENSOR_POLL_INTERVAL_SEC)
 
     if DEBUG_LOGGING_ENABLED:
         print("[SENSORS_LOOP] Sensor polling loop stopped.")
\ No newline at end of file
@@ -3,7 +3,7 @@
 import time
 import json
 import os
-import math
+import threading
 from config import (
     DEBUG_LOGGING_ENABLED,
     FALLBACK_SETPOINT_F,
@@ -13,6 +13,8 @@ from config import (
     SETPOINT_FILE,
     OPERATIONAL_PARAMS_FILE,
     OVERRIDES_FILE,
+    PERSISTENT_STATE_FILE,
+    PERSIST_FLUSH_INTERVAL_SEC,
     AHU_CALL_TIMEOUT_SEC, 
     PUMP_POST_PURGE_DURATION_SEC,
     MQTT_FAILSAFE_TIMEOUT_SEC,
@@ -23,37 +25,107 @@ from config import (
     AMBIENT_LOCKOUT_DEBOUNCE_DURATION_SEC       # <-- NEW IMPORT
 )
 
+# Relay cache keys; "chiller" is accepted as another name for the condenser relay
+_RELAY_DEVICES = frozenset(("pump", "condenser"))
+_RELAY_DEVICE_ALIASES = {"chiller": "condenser"}
+
+# Normalised override strings; anything else ("auto", "clear", "", junk) means no override (None)
+_OVERRIDE_VALUES = {"on": "on", "off": "off"}
+
+_last_written = {} # path -> JSON text this process last wrote (or read back) there
+
+def _dumps(data):
+    # Compact: these files are machine-read, and a one-line dict of a few keys is still easy to eyeball
+    return json.dumps(data, separators=(",", ":"))
+
+def _read_json(path):
+    """
+    Load a persisted JSON file in one read. The parsed content is also remembered as already written, so
+    saving back the same values right after startup doesn't rewrite the file. Errors propagate to the caller.
+    """
+    with open(path, "rb") as f:
+        data = json.loads(f.read()) # json accepts UTF-8 bytes directly; no text-layer decode
+    _last_written[path] = _dumps(data)
+    return data
+
+def _write_json(path, data):
+    """
+    Atomically replace path with data as JSON: write a temp file next to it, fsync it, then os.replace() it
+    over the original, so a crash or power cut mid-write leaves the previous file intact instead of a
+    truncated one. Skipped (returns False) when the content is identical to what was last written.
+    """
+    text = _dumps(data)
+    if _last_written.get(path) == text:
+        return False # Nothing new; spare the SD card a write
+    tmp_path = f"{path}.tmp"
+    # Encoded up front and written with one os.write(): no text-mode/buffered file object in between
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, text.encode("utf-8"))
+        os.fsync(fd) # Data must be on disk before the rename makes it the live file
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, path)
+    _last_written[path] = text
+    return True
+
 class SystemState:
+    # Fixed attribute set: no per-instance __dict__, and the control/sensor paths read slots directly.
+    # Every attribute assigned in __init__ (or anywhere else) must be listed here.
+    __slots__ = (
+        "debug", "state_change_event", "status_publish_event",
+        # Operational state
+        "setpoint", "differential", "ambient_lockout_setpoint", "_thresholds", "_overrides",
+        # Timers (monotonic)
+        "last_ahu_call_time", "last_real_ahu_call_time", "pump_post_purge_end_time", "condenser_last_off_time",
+        "last_mqtt_message_time", "last_state_publish_time", "_last_persist_time", "_persistent_dirty",
+        # Status flags
+        "mqtt_comms_lost", "critical_sensor_fault", "_invalid_critical_keys", "is_ahu_calling",
+        "ambient_lockout_active", "ambient_temp_below_lockout_setpoint_since",
+        "ambient_temp_above_lockout_release_since", "_last_lockout_log_state",
+        # Sensor data and relay cache
+        "sensor_temps", "sensor_readings_valid", "pump_relay", "condenser_relay",
+    )
+
     def __init__(self):
         self.debug = DEBUG_LOGGING_ENABLED
+        # Set whenever a control input changes so the control loop can react before its next periodic tick.
+        self.state_change_event = threading.Event()
+        # Set when a published status flag (relays, AHU call, fault, lockout) changes so MQTT can publish it right away.
+        self.status_publish_event = threading.Event()
 
         # --- Operational State ---
         self.setpoint = FALLBACK_SETPOINT_F
         self.differential = INITIAL_DIFFERENTIAL_F
         self.ambient_lockout_setpoint = INITIAL_AMBIENT_LOCKOUT_SETPOINT_F # <-- NEW state variable
+        self._thresholds = None # Cached (turn_on, turn_off); cleared when setpoint/differential change
 
-        # Override states (string "on", "off", or None for auto)
-        self.manual_pump_override = None
-        self.manual_chiller_override = None 
-        self.manual_cooling_override = None 
+        # Override states per device (string "on", "off", or None for auto)
+        self._overrides = {"pump": None, "chiller": None, "cooling": None}
 
-        # Timestamps (seconds since epoch)
-        self.last_ahu_call_time = 0         
-        self.last_real_ahu_call_time = 0    
+        # Timestamps (time.monotonic(), so NTP/wall-clock steps can't shorten or stretch any timer).
+        # "Never" is -inf rather than 0: monotonic time starts near 0 at boot, so 0 would look like "just now".
+        self.last_ahu_call_time = float("-inf")
+        self.last_real_ahu_call_time = float("-inf")
         self.pump_post_purge_end_time = 0   
-        self.condenser_last_off_time = time.time() 
-        self.last_mqtt_message_time = time.time() 
-        self.last_state_publish_time = 0 
+        self.condenser_last_off_time = time.monotonic() 
+        self.last_mqtt_message_time = time.monotonic() 
+        self.last_state_publish_time = float("-inf")
+        self._last_persist_time = float("-inf")
+        self._persistent_dirty = False # Set by setters; maybe_flush_persistent() writes and clears it
 
         # System Status Flags
         self.mqtt_comms_lost = False
         self.critical_sensor_fault = True 
+        # Critical sensors without a valid latest reading; none has been read yet. Fault whenever non-empty.
+        self._invalid_critical_keys = set(CRITICAL_SENSOR_KEYS)
         self.is_ahu_calling = False 
         self.ambient_lockout_active = False # <-- NEW state flag
         
         # Timestamps for ambient lockout debounce logic
-        self.ambient_temp_below_lockout_setpoint_since = 0  # <-- NEW: Unix timestamp
-        self.ambient_temp_above_lockout_release_since = 0 # <-- NEW: Unix timestamp
+        self.ambient_temp_below_lockout_setpoint_since = 0  # <-- NEW: monotonic timestamp, 0 = not counting
+        self.ambient_temp_above_lockout_release_since = 0 # <-- NEW: monotonic timestamp, 0 = not counting
+        self._last_lockout_log_state = None # Band ("below"/"above"/"deadband") last logged, so each is logged once per entry
 
 
         # --- Sensor Data ---
@@ -62,15 +134,11 @@ class SystemState:
 
 
         # --- Relay State Cache ---
-        self._relay_states = {
-            "pump": False,
-            "condenser": False 
-        }
+        self.pump_relay = False
+        self.condenser_relay = False
 
         # --- Load Persistent State ---
-        self.load_setpoint()
-        self.load_operational_params() # For differential AND ambient_lockout_setpoint
-        self.load_overrides()
+        self._load_persistent() # Setpoint, differential, ambient lockout setpoint and overrides
 
         if not SENSOR_IDS:
              if self.debug:
@@ -79,131 +147,137 @@ class SystemState:
         else:
             for key in SENSOR_IDS.keys():
                 self.sensor_readings_valid[key] = False 
-            if any(key in SENSOR_IDS for key in CRITICAL_SENSOR_KEYS):
-                 self.critical_sensor_fault = True
-            else:
-                 self.critical_sensor_fault = False 
+            # Faulted until the first valid reading of every configured critical sensor
+            self.critical_sensor_fault = bool(CRITICAL_SENSOR_KEYS & SENSOR_IDS.keys())
 
 
         if self.debug:
             print(f"[STATE] Initialized with setpoint={self.setpoint}°F, differential={self.differential}°F")
             print(f"[STATE] Initial Ambient Lockout Setpoint: {self.ambient_lockout_setpoint}°F") # <-- NEW LOG
-            print(f"[STATE] Initial overrides: Pump={self.manual_pump_override}, Chiller={self.manual_chiller_override}, Cooling={self.manual_cooling_override}")
+            print(f"[STATE] Initial overrides: Pump={self._overrides['pump']}, Chiller={self._overrides['chiller']}, Cooling={self._overrides['cooling']}")
 
 
     # --- Persistence Methods ---
 
-    def load_setpoint(self):
-        if os.path.exists(SETPOINT_FILE):
-            try:
-                with open(SETPOINT_FILE, "r") as f:
-                    data = json.load(f)
-                    loaded_setpoint = data.get("setpoint")
-                    if isinstance(loaded_setpoint, (int, float)):
-                        self.setpoint = float(loaded_setpoint)
-                        if self.debug:
-                            print(f"[STATE] Loaded setpoint: {self.setpoint}°F from {SETPOINT_FILE}")
-                    else:
-                         if self.debug:
-                              print(f"[STATE] Invalid setpoint value in {SETPOINT_FILE}. Using default {self.setpoint}°F.")
-            except Exception as e:
-                if self.debug:
-                    print(f"[STATE] Failed to load setpoint from {SETPOINT_FILE}: {e}. Using default {self.setpoint}°F.")
-        else:
-            if self.debug:
-                print(f"[STATE] {SETPOINT_FILE} not found. Using default setpoint {self.setpoint}°F.")
+    # Setpoint, operational parameters and overrides share one file, so startup is a single read and every
+    # save is a single atomic write. The older per-group files are only read once, to migrate them.
+    # Each load opens its file directly and treats FileNotFoundError as "not saved yet" (one syscall, no exists/open race).
 
-    def save_setpoint(self):
+    def _load_persistent(self):
         try:
-            with open(SETPOINT_FILE, "w") as f:
-                json.dump({"setpoint": self.setpoint}, f, indent=2)
+            data = _read_json(PERSISTENT_STATE_FILE)
+        except FileNotFoundError:
             if self.debug:
-                print(f"[STATE] Saved setpoint {self.setpoint}°F to {SETPOINT_FILE}")
+                print(f"[STATE] {PERSISTENT_STATE_FILE} not found. Checking for legacy state files.")
+            if self._load_legacy_files():
+                self._save_persistent() # Migrate, so later starts only read the single file
+            return
         except Exception as e:
-            print(f"[STATE] Failed to save setpoint to {SETPOINT_FILE}: {e}")
+            if self.debug:
+                print(f"[STATE] Failed to load {PERSISTENT_STATE_FILE}: {e}. Using defaults.")
+            return
 
-    def load_operational_params(self):
-        if os.path.exists(OPERATIONAL_PARAMS_FILE):
+        if not isinstance(data, dict):
+            if self.debug:
+                print(f"[STATE] Unexpected content in {PERSISTENT_STATE_FILE}. Using defaults.")
+            return
+        self._apply_setpoint(data, PERSISTENT_STATE_FILE)
+        self._apply_operational_params(data, PERSISTENT_STATE_FILE)
+        overrides = data.get("overrides")
+        self._apply_overrides(overrides if isinstance(overrides, dict) else {}, PERSISTENT_STATE_FILE)
+
+    def _load_legacy_files(self):
+        """Reads the pre-merge setpoint/operational params/overrides files. Returns True if any of them existed."""
+        legacy_loaders = (
+            (SETPOINT_FILE, self._apply_setpoint),
+            (OPERATIONAL_PARAMS_FILE, self._apply_operational_params),
+            # Overrides were stored as "manual_<device>_override" keys
+            (OVERRIDES_FILE, lambda data, source: self._apply_overrides(
+                {device: data.get(f"manual_{device}_override") for device in self._overrides}, source)),
+        )
+        found_any = False
+        for path, apply in legacy_loaders:
             try:
-                with open(OPERATIONAL_PARAMS_FILE, "r") as f:
-                    data = json.load(f)
-                
-                loaded_differential = data.get("differential")
-                if isinstance(loaded_differential, (int, float)):
-                        self.differential = float(loaded_differential)
-                        if self.debug:
-                            print(f"[STATE] Loaded differential: {self.differential}°F from {OPERATIONAL_PARAMS_FILE}")
-                else: # Use initial if not found or invalid in file
-                        self.differential = INITIAL_DIFFERENTIAL_F
-                        if self.debug:
-                            print(f"[STATE] Invalid/missing differential in {OPERATIONAL_PARAMS_FILE}. Using initial default {self.differential}°F.")
-                
-                # Load Ambient Lockout Setpoint <-- NEW
-                loaded_ambient_lockout = data.get("ambient_lockout_setpoint")
-                if isinstance(loaded_ambient_lockout, (int, float)):
-                    self.ambient_lockout_setpoint = float(loaded_ambient_lockout)
-                    if self.debug:
-                        print(f"[STATE] Loaded ambient lockout setpoint: {self.ambient_lockout_setpoint}°F from {OPERATIONAL_PARAMS_FILE}")
-                else: # Use initial if not found or invalid in file
-                    self.ambient_lockout_setpoint = INITIAL_AMBIENT_LOCKOUT_SETPOINT_F
-                    if self.debug:
-                        print(f"[STATE] Invalid/missing ambient lockout setpoint in {OPERATIONAL_PARAMS_FILE}. Using initial default {self.ambient_lockout_setpoint}°F.")
-
+                data = _read_json(path)
+            except FileNotFoundError:
+                continue
             except Exception as e:
                 if self.debug:
-                    print(f"[STATE] Failed to load operational parameters from {OPERATIONAL_PARAMS_FILE}: {e}. Using defaults.")
-                    self.differential = INITIAL_DIFFERENTIAL_F # Ensure defaults on error
-                    self.ambient_lockout_setpoint = INITIAL_AMBIENT_LOCKOUT_SETPOINT_F
-        else:
+                    print(f"[STATE] Failed to load legacy state file {path}: {e}. Skipping it.")
+                continue
+            found_any = True
+            if isinstance(data, dict):
+                apply(data, path)
+        return found_any
+
+    def _apply_setpoint(self, data, source):
+        loaded_setpoint = data.get("setpoint")
+        if isinstance(loaded_setpoint, (int, float)):
+            self.setpoint = float(loaded_setpoint)
             if self.debug:
-                print(f"[STATE] {OPERATIONAL_PARAMS_FILE} not found. Using default differential {self.differential}°F and ambient lockout {self.ambient_lockout_setpoint}°F.")
-            self.differential = INITIAL_DIFFERENTIAL_F # Ensure defaults if file not found
-            self.ambient_lockout_setpoint = INITIAL_AMBIENT_LOCKOUT_SETPOINT_F
-
-
-    def save_operational_params(self):
-        try:
-            with open(OPERATIONAL_PARAMS_FILE, "w") as f:
-                json.dump({
-                    "differential": self.differential,
-                    "ambient_lockout_setpoint": self.ambient_lockout_setpoint # <-- NEW
-                }, f, indent=2)
-            if self.debug:
-                print(f"[STATE] Saved operational parameters to {OPERATIONAL_PARAMS_FILE}")
-        except Exception as e:
-            print(f"[STATE] Failed to save operational parameters to {OPERATIONAL_PARAMS_FILE}: {e}")
-
-    def load_overrides(self):
-        if os.path.exists(OVERRIDES_FILE):
-            try:
-                with open(OVERRIDES_FILE, "r") as f:
-                    data = json.load(f)
-                self.manual_pump_override = data.get("manual_pump_override", None)
-                self.manual_chiller_override = data.get("manual_chiller_override", None)
-                self.manual_cooling_override = data.get("manual_cooling_override", None)
+                print(f"[STATE] Loaded setpoint: {self.setpoint}°F from {source}")
+        else:
+             if self.debug:
+                  print(f"[STATE] Invalid setpoint value in {source}. Using default {self.setpoint}°F.")
 
+    def _apply_operational_params(self, data, source):
+        loaded_differential = data.get("differential")
+        if isinstance(loaded_differential, (int, float)):
+                self.differential = float(loaded_differential)
                 if self.debug:
-                    print(f"[STATE] Loaded overrides from {OVERRIDES_FILE}: "
-                          f"pump={self.manual_pump_override}, chiller={self.manual_chiller_override}, cooling={self.manual_cooling_override}")
-            except Exception as e:
+                    print(f"[STATE] Loaded differential: {self.differential}°F from {source}")
+        else: # Use initial if not found or invalid in file
+                self.differential = INITIAL_DIFFERENTIAL_F
                 if self.debug:
-                    print(f"[STATE] Failed to load overrides from {OVERRIDES_FILE}: {e}. Using defaults (None).")
-        else:
+                    print(f"[STATE] Invalid/missing differential in {source}. Using initial default {self.differential}°F.")
+        
+        # Load Ambient Lockout Setpoint <-- NEW
+        loaded_ambient_lockout = data.get("ambient_lockout_setpoint")
+        if isinstance(loaded_ambient_lockout, (int, float)):
+            self.ambient_lockout_setpoint = float(loaded_ambient_lockout)
+            if self.debug:
+                print(f"[STATE] Loaded ambient lockout setpoint: {self.ambient_lockout_setpoint}°F from {source}")
+        else: # Use initial if not found or invalid in file
+            self.ambient_lockout_setpoint = INITIAL_AMBIENT_LOCKOUT_SETPOINT_F
             if self.debug:
-                print(f"[STATE] {OVERRIDES_FILE} not found, using defaults (None).")
+                print(f"[STATE] Invalid/missing ambient lockout setpoint in {source}. Using initial default {self.ambient_lockout_setpoint}°F.")
 
-    def save_overrides(self):
+    def _apply_overrides(self, overrides, source):
+        for device in self._overrides:
+            self._overrides[device] = overrides.get(device, None)
+        if self.debug:
+            print(f"[STATE] Loaded overrides from {source}: "
+                  f"pump={self._overrides['pump']}, chiller={self._overrides['chiller']}, cooling={self._overrides['cooling']}")
+
+    def _save_persistent(self):
         try:
-            with open(OVERRIDES_FILE, "w") as f:
-                json.dump({
-                    "manual_pump_override": self.manual_pump_override,
-                    "manual_chiller_override": self.manual_chiller_override,
-                    "manual_cooling_override": self.manual_cooling_override
-                }, f, indent=2)
+            _write_json(PERSISTENT_STATE_FILE, {
+                "setpoint": self.setpoint,
+                "differential": self.differential,
+                "ambient_lockout_setpoint": self.ambient_lockout_setpoint,
+                "overrides": self._overrides
+            })
             if self.debug:
-                print(f"[STATE] Saved overrides to {OVERRIDES_FILE}")
+                print(f"[STATE] Saved persistent state to {PERSISTENT_STATE_FILE}")
         except Exception as e:
-            print(f"[STATE] Failed to save overrides to {OVERRIDES_FILE}: {e}")
+            print(f"[STATE] Failed to save persistent state to {PERSISTENT_STATE_FILE}: {e}")
+
+    def maybe_flush_persistent(self, now=None, force=False):
+        """
+        Writes the persistent state if a setter changed it and PERSIST_FLUSH_INTERVAL_SEC has passed since the
+        last write (or force is set, e.g. at shutdown). Setters only mark it dirty, so a burst of MQTT
+        commands costs one write instead of one per message. Called from the control loop each iteration.
+        """
+        if not self._persistent_dirty:
+            return False
+        if now is None:
+            now = time.monotonic()
+        if not force and now - self._last_persist_time < PERSIST_FLUSH_INTERVAL_SEC:
+            return False
+        self._persistent_dirty = False # Cleared first: a change landing during the write is flushed next time
+        self._last_persist_time = now
+        self._save_persistent()
+        return True
 
 
     # --- Setpoint/Differential/Override/Lockout Control Methods ---
@@ -213,7 +287,9 @@ class SystemState:
             new_setpoint = float(value)
             if self.setpoint != new_setpoint:
                 self.setpoint = new_setpoint
-                self.save_setpoint()
+                self._thresholds = None
+                self._persistent_dirty = True # Before waking the control loop, which does the flush
+                self.state_change_event.set()
                 if self.debug:
                     print(f"[STATE] Setpoint updated to {self.setpoint}°F")
             # else: No change, no log needed unless verbose debug
@@ -226,7 +302,9 @@ class SystemState:
             new_differential = float(val)
             if self.differential != new_differential:
                 self.differential = new_differential
-                self.save_operational_params() 
+                self._thresholds = None
+                self._persistent_dirty = True
+                self.state_change_event.set()
                 if self.debug:
                     print(f"[STATE] Differential set to {self.differential}°F")
         except (ValueError, TypeError):
@@ -245,7 +323,7 @@ class SystemState:
 
             if self.ambient_lockout_setpoint != new_lockout_setpoint:
                 self.ambient_lockout_setpoint = new_lockout_setpoint
-                self.save_operational_params() # Persist it
+                self._persistent_dirty = True # Persist it
                 if self.debug:
                     print(f"[STATE] Ambient Lockout Setpoint updated to {self.ambient_lockout_setpoint}°F")
                 # Reset debounce timers when setpoint changes to re-evaluate immediately
@@ -259,113 +337,124 @@ class SystemState:
 
 
     def set_override(self, device, value):
-        if device not in ["pump", "chiller", "cooling"]:
+        if device not in self._overrides:
             if self.debug:
                 print(f"[STATE] Invalid override device: {device}")
             return
 
-        parsed_value = None
-        if isinstance(value, str):
-            val_lower = value.strip().lower()
-            if val_lower == "on":
-                parsed_value = "on"
-            elif val_lower == "off":
-                parsed_value = "off"
-
-        current_override = getattr(self, f"manual_{device}_override")
-        if current_override != parsed_value:
-            setattr(self, f"manual_{device}_override", parsed_value)
+        parsed_value = _OVERRIDE_VALUES.get(value.strip().lower()) if isinstance(value, str) else None
+
+        if self._overrides[device] != parsed_value:
+            # Replaced, not mutated (same as sensor_temps), so get_all_overrides() can hand out the dict as is
+            self._overrides = {**self._overrides, device: parsed_value}
+            self._persistent_dirty = True
+            self.state_change_event.set()
             if self.debug:
                 print(f"[STATE] Override set: {device} = {parsed_value}")
-            self.save_overrides() 
 
 
     def get_override(self, device):
-        if device not in ["pump", "chiller", "cooling"]:
-            return None
-        return getattr(self, f"manual_{device}_override", None)
+        return self._overrides.get(device) # None (auto) for unknown devices too
 
     def get_all_overrides(self):
-        return {
-            "pump": self.manual_pump_override,
-            "chiller": self.manual_chiller_override,
-            "cooling": self.manual_cooling_override
-        }
+        # Replaced, never mutated, by set_override(); don't modify it.
+        return self._overrides
+
+    def get_thresholds(self):
+        """Returns the condenser (turn_on_threshold, turn_off_threshold), recomputed only after a change."""
+        if self._thresholds is None:
+            self._thresholds = (self.setpoint + self.differential, self.setpoint)
+        return self._thresholds
 
     # --- Call/Demand Methods ---
 
     def update_ahu_call(self, is_manual_cooling=False):
-        now = time.time()
+        now = time.monotonic()
         self.last_ahu_call_time = now 
         if not is_manual_cooling:
             self.last_real_ahu_call_time = now 
 
         self.pump_post_purge_end_time = 0
+        if not self.is_ahu_calling: # A new call (not a refresh of an active one): let the controller start the pump now
+            self.state_change_event.set()
 
         if self.debug:
             call_type = "Manual Cooling Override" if is_manual_cooling else "Real AHU"
-            print(f"[STATE] {call_type} call received/updated at {now:.0f}")
+            print(f"[STATE] {call_type} call received/updated at {time.strftime('%H:%M:%S')}")
 
-    def check_for_call_timeout(self):
-        now = time.time()
-        call_is_currently_signaled = False
-        if (now - self.last_ahu_call_time) < AHU_CALL_TIMEOUT_SEC:
-             call_is_currently_signaled = True
-        if self.get_override("cooling") == "on":
-             call_is_currently_signaled = True
+    # The periodic checks below take an optional monotonic `now`, so a caller that runs several of them
+    # back-to-back (the control loop) reads the clock once and they all judge against the same instant.
+
+    def check_for_call_timeout(self, now=None):
+        if now is None:
+            now = time.monotonic()
+        # Runs every control tick: each attribute is read once and the rest works on locals.
+        call_is_currently_signaled = ((now - self.last_ahu_call_time) < AHU_CALL_TIMEOUT_SEC
+                                      or self._overrides["cooling"] == "on")
 
         if self.is_ahu_calling != call_is_currently_signaled:
             if call_is_currently_signaled:
                  if self.debug: print("[STATE_CALL] AHU Calling State: Turned ON")
             else:
                  self.pump_post_purge_end_time = now + PUMP_POST_PURGE_DURATION_SEC
-                 if self.debug: print(f"[STATE_CALL] AHU Calling State: Turned OFF. Starting pump post-purge until {self.pump_post_purge_end_time:.0f}")
+                 if self.debug: print(f"[STATE_CALL] AHU Calling State: Turned OFF. Starting pump post-purge for {PUMP_POST_PURGE_DURATION_SEC}s")
             self.is_ahu_calling = call_is_currently_signaled
+            self.status_publish_event.set()
 
-        pump_post_purging_active = (now < self.pump_post_purge_end_time)
-        overall_pump_demand = self.is_ahu_calling or pump_post_purging_active
-        
-        if self.debug:
-            # This can be very verbose, print only on change or less frequently
-            # print(f"[STATE_CALL_DEBUG] is_ahu_calling: {self.is_ahu_calling} | post_purge_active: {pump_post_purging_active} | Overall pump demand: {overall_pump_demand}")
-            pass
-
-        return overall_pump_demand 
+        # Only the ON/OFF transitions above are logged.
+        return call_is_currently_signaled or now < self.pump_post_purge_end_time 
 
     # --- Sensor Data Methods ---
 
     def update_temperatures(self, temps_by_key):
-        any_critical_sensor_invalid = False
         ambient_temp_updated = False # Flag to check if ambient temp was in this update
+        old_supply_temp = self.get_sensor_temp("supply")
 
+        # Copy-on-write: fill new dicts, then swap the references in. Readers on other threads
+        # (controller, MQTT) always see a complete snapshot, never one that is half-updated.
+        new_temps = dict(self.sensor_temps)
+        new_valid = dict(self.sensor_readings_valid)
         for key, val in temps_by_key.items():
-            is_valid = isinstance(val, (int, float)) and not math.isnan(val)
+            is_valid = isinstance(val, (int, float)) and val == val # NaN is the only value not equal to itself
             if key == "ambient" and is_valid: # Check if ambient was updated
                 ambient_temp_updated = True
 
             if is_valid:
-                self.sensor_temps[key] = val
-                self.sensor_readings_valid[key] = True
-            else:
-                self.sensor_readings_valid[key] = False
-
-            if key in CRITICAL_SENSOR_KEYS and not self.sensor_readings_valid.get(key, False):
-                any_critical_sensor_invalid = True
-
-        if not CRITICAL_SENSOR_KEYS: 
-             self.critical_sensor_fault = False
-        else:
-            critical_sensors_are_valid = all(
-                self.sensor_readings_valid.get(key, False)
-                for key in CRITICAL_SENSOR_KEYS
-            )
-            new_fault_state = not critical_sensors_are_valid
-            if self.critical_sensor_fault != new_fault_state:
-                self.critical_sensor_fault = new_fault_state
-                if self.debug: print(f"[STATE] Critical sensor fault status changed to: {self.critical_sensor_fault}")
+                new_temps[key] = val
+            new_valid[key] = is_valid
+
+            if key in CRITICAL_SENSOR_KEYS:
+                if is_valid:
+                    self._invalid_critical_keys.discard(key)
+                else:
+                    self._invalid_critical_keys.add(key)
+        # Temps first: until the validity swap, a reader sees the old flags, which only ever hide a new value.
+        self.sensor_temps = new_temps
+        self.sensor_readings_valid = new_valid
+
+        # Kept up to date in the loop above, so no second pass over the critical keys
+        new_fault_state = bool(self._invalid_critical_keys)
+        # Compared before assigning, so the lockout check below can tell whether the fault state moved
+        fault_changed = self.critical_sensor_fault != new_fault_state
+        if fault_changed:
+            self.critical_sensor_fault = new_fault_state
+            self.state_change_event.set()
+            self.status_publish_event.set()
+            if self.debug: print(f"[STATE] Critical sensor fault status changed to: {self.critical_sensor_fault}")
+
+        # Wake the controller only when supply temp crosses a condenser threshold (or goes valid/invalid),
+        # not on every reading; the loop's periodic heartbeat covers everything else.
+        new_supply_temp = self.get_sensor_temp("supply")
+        if (old_supply_temp is None) != (new_supply_temp is None):
+            self.state_change_event.set()
+        elif new_supply_temp is not None:
+            turn_on_threshold, turn_off_threshold = self.get_thresholds()
+            if ((old_supply_temp >= turn_on_threshold) != (new_supply_temp >= turn_on_threshold)
+                    or (old_supply_temp <= turn_off_threshold) != (new_supply_temp <= turn_off_threshold)):
+                self.state_change_event.set()
         
         # If ambient temp was part of this update, or if critical sensor status changed, re-evaluate lockout
-        if ambient_temp_updated or (self.critical_sensor_fault != new_fault_state):
+        if ambient_temp_updated or fault_changed:
             self.update_ambient_lockout_status()
 
 
@@ -375,19 +464,21 @@ class SystemState:
         return self.sensor_temps.get(internal_key) 
 
     def get_all_temperatures(self):
-        return dict(self.sensor_temps) 
+        # The dict is replaced, never mutated, by update_temperatures(), so it can be handed out as is; don't modify it.
+        return self.sensor_temps
 
     def is_critical_sensor_fault(self):
         return self.critical_sensor_fault
 
     # --- Ambient Lockout Logic ---
-    def update_ambient_lockout_status(self):
+    def update_ambient_lockout_status(self, now=None):
         """
         Updates the ambient_lockout_active flag based on current ambient temperature,
         setpoint, deadband, and debounce duration.
         Called when ambient temp is updated or lockout setpoint changes.
         """
-        now = time.time()
+        if now is None:
+            now = time.monotonic()
         ambient_temp = self.get_sensor_temp("ambient")
         
         # If ambient sensor is invalid, we cannot determine lockout status safely.
@@ -397,9 +488,12 @@ class SystemState:
             if self.ambient_lockout_active: # If it was active, turn it off due to sensor fault
                 if self.debug: print("[STATE_LOCKOUT] Ambient sensor failed, disabling ambient lockout.")
                 self.ambient_lockout_active = False
+                self.state_change_event.set()
+                self.status_publish_event.set()
             # Reset debounce timers
             self.ambient_temp_below_lockout_setpoint_since = 0
             self.ambient_temp_above_lockout_release_since = 0
+            self._last_lockout_log_state = None
             return self.ambient_lockout_active
 
         lockout_target = self.ambient_lockout_setpoint
@@ -408,15 +502,13 @@ class SystemState:
         current_lockout_state = self.ambient_lockout_active
         new_lockout_state = current_lockout_state # Assume no change initially
 
-        if self.debug:
-             print(f"[STATE_LOCKOUT_DBG] AmbTemp:{ambient_temp:.1f}, LkSet:{lockout_target:.1f}, RlsSet:{release_target:.1f}, Debounce:{AMBIENT_LOCKOUT_DEBOUNCE_DURATION_SEC}s")
-
         # Check for entering lockout
         if ambient_temp < lockout_target:
             if self.ambient_temp_below_lockout_setpoint_since == 0: # Just crossed below
                 self.ambient_temp_below_lockout_setpoint_since = now
                 if self.debug: print(f"[STATE_LOCKOUT] Ambient ({ambient_temp:.1f}°F) below lockout setpoint ({lockout_target:.1f}°F). Starting debounce.")
             self.ambient_temp_above_lockout_release_since = 0 # Reset other timer
+            self._last_lockout_log_state = "below"
 
             if (now - self.ambient_temp_below_lockout_setpoint_since) >= AMBIENT_LOCKOUT_DEBOUNCE_DURATION_SEC:
                 new_lockout_state = True # Debounce met, activate lockout
@@ -427,6 +519,7 @@ class SystemState:
                 self.ambient_temp_above_lockout_release_since = now
                 if self.debug: print(f"[STATE_LOCKOUT] Ambient ({ambient_temp:.1f}°F) above release setpoint ({release_target:.1f}°F). Starting debounce.")
             self.ambient_temp_below_lockout_setpoint_since = 0 # Reset other timer
+            self._last_lockout_log_state = "above"
 
             if (now - self.ambient_temp_above_lockout_release_since) >= AMBIENT_LOCKOUT_DEBOUNCE_DURATION_SEC:
                 new_lockout_state = False # Debounce met, deactivate lockout
@@ -436,11 +529,15 @@ class SystemState:
             # Reset timers if in deadband, maintaining current lockout state until one of the thresholds is crossed and held.
             self.ambient_temp_below_lockout_setpoint_since = 0
             self.ambient_temp_above_lockout_release_since = 0
-            if self.debug: print(f"[STATE_LOCKOUT] Ambient ({ambient_temp:.1f}°F) in deadband. Maintaining current lockout: {self.ambient_lockout_active}. Timers reset.")
+            if self.debug and self._last_lockout_log_state != "deadband": # Once on entry, not every poll spent in the band
+                print(f"[STATE_LOCKOUT] Ambient ({ambient_temp:.1f}°F) in deadband. Maintaining current lockout: {self.ambient_lockout_active}. Timers reset.")
+            self._last_lockout_log_state = "deadband"
 
 
         if self.ambient_lockout_active != new_lockout_state:
             self.ambient_lockout_active = new_lockout_state
+            self.state_change_event.set()
+            self.status_publish_event.set()
             if self.debug:
                 print(f"[STATE_LOCKOUT] Ambient Lockout Active status changed to: {self.ambient_lockout_active}")
         
@@ -450,42 +547,68 @@ class SystemState:
     # --- Relay State Cache Methods ---
 
     def get_relay_state(self, device):
-        if device == "chiller": device = "condenser"
-        return self._relay_states.get(device, None)
+        if device == "pump":
+            return self.pump_relay
+        if device == "condenser" or device == "chiller":
+            return self.condenser_relay
+        return None
 
     def set_relay_state(self, device, value):
-        if device == "chiller": device = "condenser"
-        if device not in ["pump", "condenser"]:
+        device = _RELAY_DEVICE_ALIASES.get(device, device)
+        if device not in _RELAY_DEVICES:
             if self.debug:
                 print(f"[STATE] Invalid device key for set_relay_state: {device}")
             return
 
-        old_state = self._relay_states.get(device)
+        old_state = self.pump_relay if device == "pump" else self.condenser_relay
         new_state = bool(value) 
 
         if old_state != new_state:
-            self._relay_states[device] = new_state
+            if device == "pump":
+                self.pump_relay = new_state
+            else:
+                self.condenser_relay = new_state
+            self.status_publish_event.set()
             if self.debug:
                 print(f"[STATE_RELAY] Relay state CACHED: {device} = {new_state}")
 
             if device == "condenser" and old_state is True and new_state is False:
-                self.condenser_last_off_time = time.time()
+                self.condenser_last_off_time = time.monotonic()
                 if self.debug:
-                    print(f"[STATE_RELAY] Condenser turned OFF. Last OFF time updated to {self.condenser_last_off_time:.0f}")
+                    print(f"[STATE_RELAY] Condenser turned OFF. Last OFF time updated (monotonic {self.condenser_last_off_time:.0f})")
+
+    def set_relay_states(self, pump_on, condenser_on):
+        """Caches both relay states in one call (used by the control loop once per actuation)."""
+        pump_on = bool(pump_on)
+        condenser_on = bool(condenser_on)
+        condenser_was_on = self.condenser_relay
+        if self.pump_relay == pump_on and condenser_was_on == condenser_on:
+            return
+
+        self.pump_relay = pump_on
+        self.condenser_relay = condenser_on
+        self.status_publish_event.set()
+        if self.debug:
+            print(f"[STATE_RELAY] Relay states CACHED: pump = {pump_on}, condenser = {condenser_on}")
+
+        if condenser_was_on and not condenser_on:
+            self.condenser_last_off_time = time.monotonic()
+            if self.debug:
+                print(f"[STATE_RELAY] Condenser turned OFF. Last OFF time updated (monotonic {self.condenser_last_off_time:.0f})")
 
 
     # --- MQTT Fail-Safe Methods ---
 
     def update_mqtt_timestamp(self):
-        now = time.time()
-        self.last_mqtt_message_time = now
+        self.last_mqtt_message_time = time.monotonic()
         if self.mqtt_comms_lost: 
              self.mqtt_comms_lost = False
              if self.debug:
-                  print(f"[STATE_MQTT] MQTT communication restored at {now:.0f}")
+                  print(f"[STATE_MQTT] MQTT communication restored at {time.strftime('%H:%M:%S')}")
 
-    def check_mqtt_failsafe(self):
-        now = time.time()
+    def check_mqtt_failsafe(self, now=None):
+        if now is None:
+            now = time.monotonic()
         if (now - self.last_mqtt_message_time) > MQTT_FAILSAFE_TIMEOUT_SEC:
             if not self.mqtt_comms_lost: 
                 self.mqtt_comms_lost = True
@@ -494,9 +617,17 @@ class SystemState:
 
 
     # --- Periodic Status Publish Timer ---
-    def should_publish_status(self):
-        now = time.time()
+    def should_publish_status(self, now=None):
+        if now is None:
+            now = time.monotonic()
         if (now - self.last_state_publish_time) >= MQTT_STATUS_PUBLISH_INTERVAL_SEC:
             self.last_state_publish_time = now
             return True
-        return False
\ No newline at end of file
+        return False
+
+    def seconds_until_status_publish(self, now=None):
+        """Time left until should_publish_status() will next return True (clamped to [0, interval])."""
+        if now is None:
+            now = time.monotonic()
+        remaining = MQTT_STATUS_PUBLISH_INTERVAL_SEC - (now - self.last_state_publish_time)
+        return min(max(remaining, 0.0), MQTT_STATUS_PUBLISH_INTERVAL_SEC)
\ No newline at end of file